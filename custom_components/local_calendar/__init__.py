@@ -1,9 +1,14 @@
 """The Local Calendar integration."""
 from __future__ import annotations
 
+import asyncio
+import datetime
+import heapq
+import importlib
 import logging
+import time
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import voluptuous as vol
 
@@ -15,18 +20,37 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
 from homeassistant.util import slugify
 
-from .calendar import LocalCalendarEntity
-from .const import CONF_CALENDAR_NAME, DOMAIN
+from .const import (
+    COMPRESSION_NONE,
+    CONF_CALENDAR_NAME,
+    CONF_STORAGE_COMPRESSION,
+    CONF_STORAGE_ENGINE,
+    DATA_IMPORT_SECONDS,
+    DOMAIN,
+    ENGINE_ICS,
+    ENGINE_SQLITE,
+    GROUP_BY,
+    PERIOD_DAY,
+    PERIODS,
+)
+from .database import LocalCalendarDatabase, export_if_newer
 from .store import LocalCalendarStore
 
+if TYPE_CHECKING:
+    # The calendar platform imports ical which builds many pydantic models, so
+    # it is only imported once a calendar is set up.
+    from .calendar import LocalCalendarEntity
+
 _LOGGER = logging.getLogger(__name__)
 
 
 PLATFORMS: list[Platform] = [Platform.CALENDAR]
 
 STORAGE_PATH = ".storage/local_calendar.{key}.ics"
+DATABASE_PATH = ".storage/local_calendar.{key}.db"
 
 CONF_EVENT = "event"
 CONF_UID = "uid"
@@ -38,6 +62,10 @@ CONF_SUMMARY = "summary"
 CONF_DESCRIPTION = "description"
 CONF_LOCATION = "location"
 CONF_RRULE = "rrule"
+CONF_ENTITY_IDS = "entity_ids"
+CONF_SYNC_TOKEN = "sync_token"
+CONF_PERIOD = "period"
+CONF_GROUP_BY = "group_by"
 
 
 CALENDAR_EVENT_SCHEMA = vol.Schema(
@@ -60,6 +88,9 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     websocket_api.async_register_command(hass, handle_calendar_event_create)
     websocket_api.async_register_command(hass, handle_calendar_event_update)
     websocket_api.async_register_command(hass, handle_calendar_event_delete)
+    websocket_api.async_register_command(hass, handle_calendar_event_query)
+    websocket_api.async_register_command(hass, handle_calendar_event_changes)
+    websocket_api.async_register_command(hass, handle_calendar_event_statistics)
 
     return True
 
@@ -67,12 +98,36 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Local Calendar from a config entry."""
     hass.data.setdefault(DOMAIN, {})
+    if DATA_IMPORT_SECONDS not in hass.data:
+        hass.data[DATA_IMPORT_SECONDS] = await hass.async_add_executor_job(
+            _import_platform
+        )
 
     key = slugify(entry.data[CONF_CALENDAR_NAME])
     path = Path(hass.config.path(STORAGE_PATH.format(key=key)))
-    hass.data[DOMAIN][entry.entry_id] = LocalCalendarStore(hass, path)
+    database_path = Path(hass.config.path(DATABASE_PATH.format(key=key)))
+    if entry.options.get(CONF_STORAGE_ENGINE, ENGINE_ICS) == ENGINE_SQLITE:
+        hass.data[DOMAIN][entry.entry_id] = LocalCalendarDatabase(
+            hass, database_path, path
+        )
+    else:
+        store = LocalCalendarStore(
+            hass,
+            path,
+            compression=entry.options.get(CONF_STORAGE_COMPRESSION, COMPRESSION_NONE),
+        )
+        # Keep changes made while the SQLite storage engine was used
+        if (
+            content := await hass.async_add_executor_job(
+                export_if_newer, database_path, path
+            )
+        ) is not None:
+            _LOGGER.debug("Exporting %s to %s", database_path, path)
+            await store.async_store(content)
+        hass.data[DOMAIN][entry.entry_id] = store
 
     hass.config_entries.async_setup_platforms(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
     return True
 
@@ -85,12 +140,26 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+def _import_platform() -> float:
+    """Import the calendar platform, returning the time it took."""
+    start = time.perf_counter()
+    importlib.import_module(".calendar", __name__)
+    return time.perf_counter() - start
+
+
 def _get_calendar_entity(hass: HomeAssistant, entity_id: str) -> LocalCalendarEntity:
     if (component := hass.data.get("calendar")) is None:
         raise HomeAssistantError("Calendar integration not set up")
 
-    if (entity := component.get_entity(entity_id)) is None or not isinstance(
-        entity, LocalCalendarEntity
+    if (
+        (entity := component.get_entity(entity_id)) is None
+        or entity.platform is None
+        or entity.platform.platform_name != DOMAIN
     ):
         raise HomeAssistantError(f"Calendar entity not found: {entity_id}")
     return entity
@@ -180,3 +249,156 @@ async def handle_calendar_event_delete(
         connection.send_error(msg["id"], "failed", str(ex))
     else:
         connection.send_result(msg["id"])
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "calendar/event/query",
+        vol.Required(CONF_ENTITY_IDS): cv.entity_ids,
+        vol.Required(CONF_START): cv.datetime,
+        vol.Required(CONF_END): cv.datetime,
+    }
+)
+@websocket_api.async_response
+async def handle_calendar_event_query(
+    hass: HomeAssistant, connection: ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Handle a query of events merged from multiple calendars.
+
+    Each calendar returns its occurrences in timeline order so the results are
+    merged rather than sorted, and each event is tagged with its calendar.
+    """
+    try:
+        entities = [
+            _get_calendar_entity(hass, entity_id)
+            for entity_id in dict.fromkeys(msg[CONF_ENTITY_IDS])
+        ]
+    except HomeAssistantError as ex:
+        connection.send_error(msg["id"], "failed", str(ex))
+        return
+    start = dt_util.as_local(msg[CONF_START])
+    end = dt_util.as_local(msg[CONF_END])
+    try:
+        results = await asyncio.gather(
+            *(entity.async_query(start, end) for entity in entities)
+        )
+    except HomeAssistantError as ex:
+        connection.send_error(msg["id"], "failed", str(ex))
+        return
+    streams = [
+        [(timespan, entity.entity_id, event) for timespan, event in occurrences]
+        for entity, (occurrences, _) in zip(entities, results)
+    ]
+    connection.send_result(
+        msg["id"],
+        {
+            "events": [
+                {
+                    **event.as_dict(),
+                    "start": _local_isoformat(event.start),
+                    "end": _local_isoformat(event.end),
+                    CONF_UID: event.uid,
+                    CONF_RECURRENCE_ID: event.recurrence_id,
+                    CONF_RRULE: event.rrule,
+                    "entity_id": entity_id,
+                }
+                for _, entity_id, event in heapq.merge(
+                    *streams, key=lambda item: item[0]
+                )
+            ],
+            "truncated": [
+                entity.entity_id
+                for entity, (_, truncated) in zip(entities, results)
+                if truncated
+            ],
+        },
+    )
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "calendar/event/changes",
+        vol.Required("entity_id"): cv.entity_id,
+        vol.Optional(CONF_SYNC_TOKEN): cv.string,
+    }
+)
+@websocket_api.async_response
+async def handle_calendar_event_changes(
+    hass: HomeAssistant, connection: ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Handle a request for the events changed since a sync token.
+
+    Without a token, or when the token is too old, the result asks the client
+    to resync the whole calendar and returns a token to sync from afterwards.
+    """
+    try:
+        entity = _get_calendar_entity(hass, msg["entity_id"])
+    except HomeAssistantError as ex:
+        connection.send_error(msg["id"], "failed", str(ex))
+        return
+    sync_token = entity.sync_token
+    changes = None
+    if CONF_SYNC_TOKEN in msg:
+        changes = entity.async_changes_since(msg[CONF_SYNC_TOKEN])
+    if changes is None:
+        connection.send_result(msg["id"], {CONF_SYNC_TOKEN: sync_token, "resync": True})
+        return
+    changed, deleted = changes
+    connection.send_result(
+        msg["id"],
+        {
+            CONF_SYNC_TOKEN: sync_token,
+            "resync": False,
+            "changed": [
+                {
+                    **event.as_dict(),
+                    "start": _local_isoformat(event.start),
+                    "end": _local_isoformat(event.end),
+                    CONF_UID: event.uid,
+                    CONF_RECURRENCE_ID: event.recurrence_id,
+                    CONF_RRULE: event.rrule,
+                }
+                for event in changed
+            ],
+            "deleted": deleted,
+        },
+    )
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "calendar/event/statistics",
+        vol.Required("entity_id"): cv.entity_id,
+        vol.Required(CONF_START): cv.datetime,
+        vol.Required(CONF_END): cv.datetime,
+        vol.Optional(CONF_PERIOD, default=PERIOD_DAY): vol.In(PERIODS),
+        vol.Optional(CONF_GROUP_BY): vol.In(GROUP_BY),
+    }
+)
+@websocket_api.async_response
+async def handle_calendar_event_statistics(
+    hass: HomeAssistant, connection: ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Handle a request for occurrence counts and durations per period."""
+    try:
+        entity = _get_calendar_entity(hass, msg["entity_id"])
+        await entity.async_wait_loaded()
+    except HomeAssistantError as ex:
+        connection.send_error(msg["id"], "failed", str(ex))
+        return
+    connection.send_result(
+        msg["id"],
+        entity.async_statistics(
+            dt_util.as_local(msg[CONF_START]),
+            dt_util.as_local(msg[CONF_END]),
+            msg[CONF_PERIOD],
+            msg.get(CONF_GROUP_BY),
+        ),
+    )
+
+
+def _local_isoformat(value: datetime.date | datetime.datetime) -> str:
+    """Return the date or floating datetime in the local time zone."""
+    if isinstance(value, datetime.datetime):
+        return dt_util.as_local(value).isoformat()
+    return value.isoformat()
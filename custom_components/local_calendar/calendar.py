@@ -2,9 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
+import heapq
 import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any
 
 import voluptuous as vol
@@ -14,20 +20,63 @@ from homeassistant.components.calendar import (
     CalendarEvent,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers import entity_platform
 from homeassistant.helpers.entity import generate_entity_id
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.start import async_at_start
 from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
 from ical.calendar import Calendar
 from ical.calendar_stream import IcsCalendarStream
 from ical.event import Event
 from ical.store import EventStore
-from ical.types import Range, Recur
+from ical.timespan import Timespan
+from ical.types import Range
+from pyparsing import ParseBaseException
 
-from .const import CONF_CALENDAR_NAME, DOMAIN
+from .changes import ChangeLog
+from .const import (
+    CONF_CALENDAR_NAME,
+    CONF_MAX_EXPANSION_TIME,
+    CONF_MAX_OCCURRENCES,
+    CONF_PARALLEL_EXPANSION_THRESHOLD,
+    CONF_QUERY_CHUNK_SIZE,
+    CONF_QUERY_CHUNK_TIME,
+    DEFAULT_MAX_EXPANSION_TIME,
+    DEFAULT_MAX_OCCURRENCES,
+    DEFAULT_PARALLEL_EXPANSION_THRESHOLD,
+    DEFAULT_QUERY_CHUNK_SIZE,
+    DEFAULT_QUERY_CHUNK_TIME,
+    DOMAIN,
+    GROUP_BY,
+    PERIOD_DAY,
+    PERIODS,
+)
+from .database import EventRecord, LocalCalendarDatabase
+from .day_index import DayIndex
+from .expansion import (
+    Expansion,
+    ExpansionLimits,
+    QueryChunks,
+    async_expand_overlapping,
+    exceeds_limits,
+    expand_active_after,
+    expand_overlapping,
+)
+from .memory import EventCompactor
+from .parallel import ParallelExpansion
+from .profiler import CalendarProfiler
+from .restore import RestoredEvents
+from .serialization import EventRenderCache, calendar_header, event_to_ics
+from .series import compact_series
+from .statistics import compute_statistics
 from .store import LocalCalendarStore
+from .trigger import async_set_calendar_entity
+from .validation import construct_event
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -41,6 +90,11 @@ EVENT_SUMMARY = "summary"
 EVENT_RRULE = "rrule"
 EVENT_UID = "uid"
 
+ATTR_UPCOMING_EVENTS = "upcoming_events"
+UPCOMING_EVENTS_LIMIT = 5
+
+_Occurrence = tuple[Timespan, "LocalCalendarEvent"]
+
 
 SERVICE_CREATE_EVENT = "create_event"
 CREATE_EVENT_SCHEMA = vol.All(
@@ -55,6 +109,46 @@ CREATE_EVENT_SCHEMA = vol.All(
     ),
 )
 
+SERVICE_PROFILE = "profile"
+PROFILE_DURATION = "duration"
+PROFILE_OPERATIONS = "operations"
+PROFILE_PATH = "local_calendar.{name}.{timestamp}.pstats"
+PROFILE_SCHEMA = vol.All(
+    cv.make_entity_service_schema(
+        {
+            vol.Optional(PROFILE_DURATION, default=60): cv.positive_float,
+            vol.Optional(PROFILE_OPERATIONS): cv.positive_int,
+        }
+    ),
+)
+
+SERVICE_EXPORT_ICS = "export_ics"
+EXPORT_PATH = "local_calendar.{name}.{timestamp}.ics"
+
+SERVICE_IMPORT_ICS = "import_ics"
+IMPORT_FILENAME = "filename"
+IMPORT_ICS_SCHEMA = vol.All(
+    cv.make_entity_service_schema({vol.Required(IMPORT_FILENAME): cv.string}),
+)
+
+SERVICE_COMPACT_SERIES = "compact_series"
+EVENT_SERIES_COMPACTED = f"{DOMAIN}_series_compacted"
+
+SERVICE_STATISTICS = "statistics"
+STATISTICS_PERIOD = "period"
+STATISTICS_GROUP_BY = "group_by"
+STATISTICS_SCHEMA = vol.All(
+    cv.make_entity_service_schema(
+        {
+            vol.Required(EVENT_START): cv.datetime,
+            vol.Required(EVENT_END): cv.datetime,
+            vol.Optional(STATISTICS_PERIOD, default=PERIOD_DAY): vol.In(PERIODS),
+            vol.Optional(STATISTICS_GROUP_BY): vol.In(GROUP_BY),
+        }
+    ),
+)
+EVENT_STATISTICS = f"{DOMAIN}_statistics"
+
 SERVICE_DELETE_EVENT = "delete_event"
 DELETE_EVENT_SCHEMA = vol.All(
     cv.make_entity_service_schema(
@@ -84,11 +178,42 @@ async def async_setup_entry(
     """Set up the local calendar platform."""
     store = hass.data[DOMAIN][config_entry.entry_id]
     ics = await store.async_load()
-    calendar = IcsCalendarStream.calendar_from_ics(ics)
+    compactor = EventCompactor()
+    limits = ExpansionLimits(
+        max_occurrences=config_entry.options.get(
+            CONF_MAX_OCCURRENCES, DEFAULT_MAX_OCCURRENCES
+        ),
+        max_seconds=config_entry.options.get(
+            CONF_MAX_EXPANSION_TIME, DEFAULT_MAX_EXPANSION_TIME
+        ),
+    )
+    chunks = QueryChunks(
+        size=config_entry.options.get(CONF_QUERY_CHUNK_SIZE, DEFAULT_QUERY_CHUNK_SIZE),
+        seconds=config_entry.options.get(
+            CONF_QUERY_CHUNK_TIME, DEFAULT_QUERY_CHUNK_TIME
+        )
+        / 1000,
+    )
+    parallel = None
+    if threshold := config_entry.options.get(
+        CONF_PARALLEL_EXPANSION_THRESHOLD, DEFAULT_PARALLEL_EXPANSION_THRESHOLD
+    ):
+        parallel = ParallelExpansion(threshold)
 
     name = config_entry.data[CONF_CALENDAR_NAME]
     entity_id = generate_entity_id(ENTITY_ID_FORMAT, name, hass=hass)
-    entity = LocalCalendarEntity(store, calendar, name, entity_id)
+    entity = LocalCalendarEntity(
+        store,
+        _parse_header(ics),
+        name,
+        entity_id,
+        CalendarProfiler(hass),
+        compactor,
+        limits,
+        chunks,
+        parallel,
+        ics,
+    )
     async_add_entities([entity], True)
 
     platform = entity_platform.async_get_current_platform()
@@ -102,20 +227,91 @@ async def async_setup_entry(
         DELETE_EVENT_SCHEMA,
         "async_delete_event",
     )
+    platform.async_register_entity_service(
+        SERVICE_PROFILE,
+        PROFILE_SCHEMA,
+        "async_profile",
+    )
+    platform.async_register_entity_service(
+        SERVICE_EXPORT_ICS,
+        cv.make_entity_service_schema({}),
+        "async_export_ics",
+    )
+    platform.async_register_entity_service(
+        SERVICE_IMPORT_ICS,
+        IMPORT_ICS_SCHEMA,
+        "async_import_ics",
+    )
+    platform.async_register_entity_service(
+        SERVICE_COMPACT_SERIES,
+        cv.make_entity_service_schema({}),
+        "async_compact_series",
+    )
+    platform.async_register_entity_service(
+        SERVICE_STATISTICS,
+        STATISTICS_SCHEMA,
+        "async_statistics_service",
+    )
 
 
-class LocalCalendarEntity(CalendarEntity):
-    """A calendar entity backed by a local iCalendar file."""
+class LocalCalendarEntity(CalendarEntity, RestoreEntity):
+    """A calendar entity backed by a local iCalendar file.
+
+    The events are parsed in the background once the entity is added, and
+    until then the state is restored from the last known upcoming events.
+    """
 
     _attr_has_entity_name = True
 
     def __init__(
-        self, store: LocalCalendarStore, calendar: Calendar, name: str, entity_id: str
+        self,
+        store: LocalCalendarStore | LocalCalendarDatabase,
+        calendar: Calendar,
+        name: str,
+        entity_id: str,
+        profiler: CalendarProfiler,
+        compactor: EventCompactor,
+        limits: ExpansionLimits,
+        chunks: QueryChunks,
+        parallel: ParallelExpansion | None = None,
+        ics: str | None = None,
     ) -> None:
-        """Initialize LocalCalendarEntity."""
+        """Initialize LocalCalendarEntity.
+
+        When ics content is specified, the calendar only holds its properties
+        and the events are loaded from the content after the entity is added.
+        """
         self._store = store
         self._calendar = calendar
+        self._ics = ics
+        self._loaded = asyncio.Event()
+        if ics is None:
+            self._loaded.set()
+        self._load_task: asyncio.Task[None] | None = None
+        self._load_error: str | None = None
+        self._profiler = profiler
+        self._compactor = compactor
+        self._limits = limits
+        self._chunks = chunks
+        self._parallel = parallel
+        self._truncated_queries = 0
         self._event: LocalCalendarEvent | None = None
+        # The next upcoming events sorted by their timespan, bounded to
+        # UPCOMING_EVENTS_LIMIT. When complete, the list holds every remaining
+        # event on the calendar rather than a prefix.
+        self._upcoming: list[_Occurrence] = []
+        self._upcoming_complete = False
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._changes = ChangeLog()
+        self._renders = EventRenderCache()
+        self._series_compaction: dict[str, Any] | None = None
+        # Occurrences by day for the common dashboard windows, computed after
+        # startup and repaired when events change. Queries within the indexed
+        # days are served without expanding the calendar.
+        self._day_index: DayIndex | None = None
+        self._window_hits = 0
+        self._window_misses = 0
+        self._warm_up_seconds: float | None = None
         self._attr_name = name.capitalize()
         self.entity_id = entity_id
         self._attr_unique_id = calendar.prodid
@@ -125,66 +321,741 @@ class LocalCalendarEntity(CalendarEntity):
         """Return the next upcoming event."""
         return self._event
 
+    @property
+    def available(self) -> bool:
+        """Return false if the calendar could not be loaded."""
+        return self._load_error is None
+
+    @property
+    def extra_restore_state_data(self) -> RestoredEvents:
+        """Return the current and next event to restore at startup."""
+        return RestoredEvents.from_occurrences(self._upcoming)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the next upcoming events on the calendar."""
+        if not self._upcoming:
+            return None
+        return {
+            ATTR_UPCOMING_EVENTS: [
+                {**event.as_dict(), EVENT_UID: event.uid} for _, event in self._upcoming
+            ]
+        }
+
     async def async_get_events(
         self, hass: HomeAssistant, start_date: datetime, end_date: datetime
     ) -> list[LocalCalendarEvent]:
         """Get all events in a specific time frame."""
-        events = self._calendar.timeline_tz(dt_util.DEFAULT_TIME_ZONE).overlapping(
-            start_date, end_date
+        occurrences, _ = await self.async_query(start_date, end_date)
+        return [event for _, event in occurrences]
+
+    async def async_query(
+        self, start: datetime, end: datetime
+    ) -> tuple[list[_Occurrence], bool]:
+        """Return occurrences overlapping the range in timeline order.
+
+        Also returns true if the query was truncated by the expansion limits.
+        """
+        await self.async_wait_loaded()
+        with self._profiler.profile():
+            if self._day_index is not None and self._day_index.covers(
+                dt_util.DEFAULT_TIME_ZONE, start, end
+            ):
+                self._window_hits += 1
+                return self._day_index.lookup(start, end), False
+            self._window_misses += 1
+            # The snapshot is not modified by changes made while the query runs
+            events = self._calendar.events
+            if self._parallel is not None and self._parallel.should_split(
+                events, start, end
+            ):
+                # Other tasks run on the loop while the workers expand events
+                with self._profiler.paused():
+                    expansion = await self._parallel.async_expand(
+                        events,
+                        dt_util.DEFAULT_TIME_ZONE,
+                        start,
+                        end,
+                        self._limits,
+                    )
+            else:
+                expansion = await async_expand_overlapping(
+                    events,
+                    dt_util.DEFAULT_TIME_ZONE,
+                    start,
+                    end,
+                    self._limits,
+                    self._chunks,
+                    self._async_yield,
+                )
+            self._check_truncated(
+                expansion.truncated, len(expansion.occurrences), start, end
+            )
+            return [
+                (timespan, _get_calendar_event(event))
+                for timespan, event in expansion.occurrences
+            ], expansion.truncated
+
+    async def _async_yield(self) -> None:
+        """Let other tasks run between chunks of a query."""
+        with self._profiler.paused():
+            await asyncio.sleep(0)
+
+    def memory_report(self) -> dict[str, Any]:
+        """Return a report of the memory used by events for diagnostics."""
+        return self._compactor.report(self._calendar.events)
+
+    def cache_report(self) -> dict[str, Any]:
+        """Return a report of the day index for diagnostics."""
+        return {
+            "day_index": self._day_index.report() if self._day_index else None,
+            "hits": self._window_hits,
+            "misses": self._window_misses,
+            "warm_up_seconds": self._warm_up_seconds,
+        }
+
+    def render_report(self) -> dict[str, Any]:
+        """Return the hit ratio of the rendered event cache."""
+        return self._renders.report()
+
+    def expansion_report(self) -> dict[str, Any]:
+        """Return the expansion limits and number of truncated queries."""
+        return {
+            "max_occurrences": self._limits.max_occurrences,
+            "max_seconds": self._limits.max_seconds,
+            "truncated_queries": self._truncated_queries,
+            "parallel": self._parallel.report() if self._parallel else None,
+        }
+
+    def _snapshot(self, uids: set[str]) -> Calendar:
+        """Return a copy of the calendar to modify and swap in when done.
+
+        The events with the uids may be modified in place so they are copied,
+        and all other events are shared with the current calendar. Readers
+        keep using the calendar they started with and never see a change
+        that is half applied.
+        """
+        return self._calendar.copy(
+            update={
+                "events": [
+                    event.copy(deep=True) if event.uid in uids else event
+                    for event in self._calendar.events
+                ],
+                "timezones": list(self._calendar.timezones),
+            }
+        )
+
+    @contextmanager
+    def _edit(self, uids: set[str]) -> Iterator[Calendar]:
+        """Modify a snapshot of the calendar and swap it in when done.
+
+        The edit must not await, so the calendar can't be replaced between
+        taking the snapshot and swapping it in.
+        """
+        calendar = self._snapshot(uids)
+        yield calendar
+        self._calendar = calendar
+
+    async def async_profile(
+        self, duration: float, operations: int | None = None
+    ) -> None:
+        """Capture a profile of calendar operations to the config directory."""
+        path = self.hass.config.path(
+            PROFILE_PATH.format(
+                name=slugify(self.entity_id),
+                timestamp=dt_util.utcnow().strftime("%Y%m%d%H%M%S"),
+            )
+        )
+        self._profiler.async_start(path, timedelta(seconds=duration), operations)
+
+    @property
+    def series_compaction(self) -> dict[str, Any] | None:
+        """Return the result of the last recurring series compaction."""
+        return self._series_compaction
+
+    async def async_compact_series(self) -> None:
+        """Fold redundant overrides and split series back into their series."""
+        await self.async_wait_loaded()
+        with self._profiler.profile():
+            calendar = self._snapshot(
+                {
+                    event.uid
+                    for event in self._calendar.events
+                    if event.rrule or event.recurrence_id
+                }
+            )
+            result = compact_series(calendar, dt_util.DEFAULT_TIME_ZONE, dt_util.now())
+        self._series_compaction = result.as_dict()
+        _LOGGER.info(
+            "Compacted %s: folded %d overrides, merged %d series, pruned %d "
+            "exdates; expansion %.1fx faster",
+            self.entity_id,
+            result.overrides_folded,
+            result.series_merged,
+            result.exdates_pruned,
+            result.speedup,
+        )
+        self.hass.bus.async_fire(
+            EVENT_SERIES_COMPACTED,
+            {"entity_id": self.entity_id, **self._series_compaction},
+        )
+        if result.uids:
+            self._replace_events(calendar, result.uids)
+            await self._async_calendar_changed(result.uids)
+
+    @callback
+    def async_statistics(
+        self,
+        start: datetime,
+        end: datetime,
+        period: str = PERIOD_DAY,
+        group_by: str | None = None,
+    ) -> dict[str, Any]:
+        """Return occurrence counts and durations per period in the range."""
+        with self._profiler.profile():
+            result = compute_statistics(
+                self._calendar.events,
+                dt_util.DEFAULT_TIME_ZONE,
+                start,
+                end,
+                period,
+                group_by,
+                self._limits,
+            )
+        self._check_truncated(result.truncated, result.occurrences, start, end)
+        return result.as_dict()
+
+    async def async_statistics_service(
+        self,
+        dtstart: datetime,
+        dtend: datetime,
+        period: str = PERIOD_DAY,
+        group_by: str | None = None,
+    ) -> None:
+        """Fire an event with the statistics, since services can't return data."""
+        await self.async_wait_loaded()
+        statistics = self.async_statistics(
+            dt_util.as_local(dtstart), dt_util.as_local(dtend), period, group_by
+        )
+        self.hass.bus.async_fire(
+            EVENT_STATISTICS, {"entity_id": self.entity_id, **statistics}
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the last events, then load the calendar in the background."""
+        await super().async_added_to_hass()
+        if (ics := self._ics) is not None:
+            self._ics = None
+            if (data := await self.async_get_last_extra_data()) is not None and (
+                restored := RestoredEvents.from_dict(data.as_dict())
+            ) is not None:
+                self._upcoming = [
+                    (timespan, LocalCalendarEvent(**values))
+                    for timespan, values in restored.occurrences(dt_util.now())
+                ]
+                self._event = self._upcoming[0][1] if self._upcoming else None
+            self._load_task = self.hass.async_create_task(self._async_load(ics))
+        self.async_on_remove(self._store.async_watch(self._async_reload))
+        self.async_on_remove(async_at_start(self.hass, self._async_warm_up))
+        async_set_calendar_entity(self.hass, self.entity_id, self)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop loading and the worker processes used to expand wide queries."""
+        async_set_calendar_entity(self.hass, self.entity_id, None)
+        if self._load_task is not None:
+            self._load_task.cancel()
+        if self._parallel is not None:
+            await self._parallel.async_shutdown()
+
+    async def async_wait_loaded(self) -> None:
+        """Wait for the calendar to load in the background."""
+        await self._loaded.wait()
+        if self._load_error is not None:
+            raise HomeAssistantError(self._load_error)
+
+    async def _async_load(self, ics: str) -> None:
+        """Parse the events and replace the restored state."""
+        start = time.perf_counter()
+        try:
+            calendar = await self.hass.async_add_executor_job(
+                IcsCalendarStream.calendar_from_ics, ics
+            )
+        except ValueError as err:
+            self._load_error = f"Unable to load {self.entity_id}: {err}"
+            _LOGGER.error(self._load_error)
+            self._loaded.set()
+            self.async_write_ha_state()
+            return
+        self._compactor.compact(calendar.events)
+        self._calendar = calendar
+        self._upcoming = []
+        self._upcoming_complete = False
+        uids = self._event_uids()
+        self._changes.record(uids)
+        with self._profiler.profile():
+            self._rebuild_upcoming(dt_util.now())
+        self._event = self._upcoming[0][1] if self._upcoming else None
+        if isinstance(self._store, LocalCalendarDatabase) and not (
+            self._store.initialized
+        ):
+            await self.async_write_database()
+        self._loaded.set()
+        _LOGGER.debug(
+            "Loaded %s with %d events in %.3fs",
+            self.entity_id,
+            len(calendar.events),
+            time.perf_counter() - start,
+        )
+        self.async_write_ha_state()
+        for update_callback in list(self._listeners):
+            update_callback(uids)
+
+    async def _async_warm_up(self, hass: HomeAssistant) -> None:
+        """Index the days most likely to be requested by a dashboard.
+
+        The next upcoming event is already computed when the calendar loads.
+        """
+        await self._loaded.wait()
+        if self._load_error is not None:
+            return
+        start = time.perf_counter()
+        with self._profiler.profile():
+            self._build_day_index(dt_util.now())
+        self._warm_up_seconds = time.perf_counter() - start
+        _LOGGER.debug(
+            "Warmed up %s in %.3fs: %s",
+            self.entity_id,
+            self._warm_up_seconds,
+            self._day_index.report() if self._day_index else None,
+        )
+
+    def _build_day_index(self, now: datetime) -> None:
+        """Index the occurrences for today, this week and this month."""
+        windows = _warm_up_windows(now)
+        timespan = Timespan.of(
+            min(window.start for window in windows),
+            max(window.end for window in windows),
+        )
+        occurrences, truncated = self._occurrences(timespan.start, timespan.end)
+        if truncated:
+            self._day_index = None
+            return
+        self._day_index = DayIndex(dt_util.DEFAULT_TIME_ZONE, timespan)
+        self._day_index.add(occurrences)
+
+    async def _async_reload(self) -> None:
+        """Reload the calendar from storage and apply only the changed events."""
+        await self._loaded.wait()
+        base = self._calendar
+        try:
+            if (ics := await self._store.async_load_if_changed()) is None:
+                return
+            calendar, changed = await self.hass.async_add_executor_job(
+                _parse_changes, ics, base
+            )
+        except (OSError, ValueError, ParseBaseException) as err:
+            # The file may be partly written by a sync tool, and is loaded
+            # again when the tool finishes writing it
+            _LOGGER.warning(
+                "Unable to reload %s, keeping the current events: %s",
+                self.entity_id,
+                err,
+            )
+            return
+        current = self._calendar
+        self._replace_events(calendar, changed)
+        if self._load_error is not None:
+            _LOGGER.info("Loaded %s after it failed to load", self.entity_id)
+            self._load_error = None
+            self.async_write_ha_state()
+        _LOGGER.debug("Reloaded calendar with %d changed events", len(changed))
+        if not changed:
+            return
+        if current is not base:
+            # Events were changed and written while the file was parsed,
+            # replacing the file contents that were just applied
+            await self._async_calendar_changed(changed)
+            return
+        self._async_events_changed(changed)
+
+    def _replace_events(self, calendar: Calendar, changed: set[str]) -> None:
+        """Replace the changed events with those of another calendar.
+
+        The uids are the events that differ between the other calendar and
+        the base calendar it was compared to. When the calendar was changed
+        after the base was taken, for example while the other calendar was
+        parsed, those changes are kept unless the same event differs in the
+        other calendar. The events are swapped in as a new snapshot.
+        """
+        if not changed:
+            return
+        current = _events_by_uid(self._calendar.events)
+        loaded = _events_by_uid(calendar.events)
+        # Keep the current event objects for unchanged events
+        events: list[Event] = []
+        for uid, uid_events in loaded.items():
+            if uid in changed:
+                events.extend(uid_events)
+            elif uid in current:
+                events.extend(current[uid])
+        # Events added since the base was taken
+        for uid, uid_events in current.items():
+            if uid not in loaded and uid not in changed:
+                events.extend(uid_events)
+        # Copy without validation, assignment would validate every event
+        self._calendar = self._calendar.copy(
+            update={"events": events, "timezones": list(calendar.timezones)}
+        )
+
+    async def async_export_ics(self) -> None:
+        """Write the calendar as an ics file to the config directory."""
+        await self.async_wait_loaded()
+        path = Path(
+            self.hass.config.path(
+                EXPORT_PATH.format(
+                    name=slugify(self.entity_id),
+                    timestamp=dt_util.utcnow().strftime("%Y%m%d%H%M%S"),
+                )
+            )
+        )
+        with self._profiler.profile():
+            content = IcsCalendarStream.calendar_to_ics(self._calendar)
+        await self.hass.async_add_executor_job(path.write_text, content)
+        _LOGGER.info("Exported %s to %s", self.entity_id, path)
+
+    async def async_import_ics(self, filename: str) -> None:
+        """Replace the events on the calendar with those from an ics file."""
+        await self.async_wait_loaded()
+        base = self._calendar
+        path = Path(self.hass.config.path(filename)).resolve()
+        config_dir = Path(self.hass.config.config_dir).resolve()
+        if not (
+            path.is_relative_to(config_dir)
+            or self.hass.config.is_allowed_path(str(path))
+        ):
+            raise HomeAssistantError(f"Import path is not allowed: {path}")
+        try:
+            content = await self.hass.async_add_executor_job(path.read_text)
+        except OSError as err:
+            raise HomeAssistantError(f"Unable to read {path}: {err}") from err
+        calendar, changed = await self.hass.async_add_executor_job(
+            _parse_changes, content, base
+        )
+        self._replace_events(calendar, changed)
+        if changed:
+            await self._async_calendar_changed(changed)
+        _LOGGER.info(
+            "Imported %s into %s with %d changed events",
+            path,
+            self.entity_id,
+            len(changed),
+        )
+
+    @property
+    def sync_token(self) -> str:
+        """Return the token for the current state of the calendar."""
+        return self._changes.sync_token
+
+    @callback
+    def async_changes_since(
+        self, sync_token: str
+    ) -> tuple[list[LocalCalendarEvent], list[str]] | None:
+        """Return the changed and deleted events since the sync token.
+
+        Returns None when the token is too old and the client must resync.
+        """
+        if (uids := self._changes.changes_since(sync_token)) is None:
+            return None
+        changed = [
+            _get_calendar_event(event)
+            for event in self._calendar.events
+            if event.uid in uids
+        ]
+        deleted = uids - {event.uid for event in changed}
+        return changed, sorted(deleted)
+
+    @callback
+    def async_add_listener(
+        self, update_callback: Callable[[set[str]], None]
+    ) -> CALLBACK_TYPE:
+        """Listen for changes to events, invoked with the uids that changed."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_occurrences(
+        self, start: datetime, end: datetime, uids: set[str] | None = None
+    ) -> list[_Occurrence]:
+        """Return event occurrences overlapping the time range in timeline order.
+
+        The occurrences may be restricted to the events with the specified uids
+        to avoid expanding the rest of the calendar.
+        """
+        return self._occurrences(start, end, uids)[0]
+
+    def _occurrences(
+        self, start: datetime, end: datetime, uids: set[str] | None = None
+    ) -> tuple[list[_Occurrence], bool]:
+        """Return occurrences overlapping the time range and if truncated."""
+        expansion = self._expand(start, end, uids)
+        return (
+            [
+                (timespan, _get_calendar_event(event))
+                for timespan, event in expansion.occurrences
+            ],
+            expansion.truncated,
+        )
+
+    def _expand(
+        self, start: datetime, end: datetime, uids: set[str] | None = None
+    ) -> Expansion:
+        """Expand events overlapping the time range within the query limits."""
+        events = self._calendar.events
+        if uids is not None:
+            events = [event for event in events if event.uid in uids]
+        expansion = expand_overlapping(
+            events, dt_util.DEFAULT_TIME_ZONE, start, end, self._limits
+        )
+        self._check_truncated(
+            expansion.truncated, len(expansion.occurrences), start, end
+        )
+        return expansion
+
+    def _check_truncated(
+        self, truncated: bool, occurrences: int, start: datetime, end: datetime
+    ) -> None:
+        """Record a query that was stopped by the expansion limits."""
+        if not truncated:
+            return
+        self._truncated_queries += 1
+        _LOGGER.warning(
+            "Query of %s from %s to %s was truncated after %d occurrences; "
+            "a recurring event may produce too many occurrences",
+            self.entity_id,
+            start,
+            end,
+            occurrences,
         )
-        return [_get_calendar_event(event) for event in events]
 
     async def async_update(self) -> None:
         """Update entity state with the next upcoming event."""
-        events = self._calendar.timeline_tz(dt_util.DEFAULT_TIME_ZONE).active_after(
-            dt_util.now()
+        now = dt_util.now()
+        if not self._loaded.is_set():
+            # Drop restored events that ended while the calendar loads
+            self._upcoming = [item for item in self._upcoming if item[0].end > now]
+            self._event = self._upcoming[0][1] if self._upcoming else None
+            return
+        if self._day_index is not None and not self._day_index.covers(
+            dt_util.DEFAULT_TIME_ZONE, now, now
+        ):
+            # The time zone changed or the indexed days have passed
+            with self._profiler.profile():
+                self._build_day_index(now)
+        self._upcoming = [item for item in self._upcoming if item[0].end > now]
+        if len(self._upcoming) < UPCOMING_EVENTS_LIMIT and not self._upcoming_complete:
+            with self._profiler.profile():
+                self._rebuild_upcoming(now)
+        self._event = self._upcoming[0][1] if self._upcoming else None
+
+    def _update_upcoming(self, uids: set[str]) -> None:
+        """Repair the upcoming events after the specified events changed.
+
+        Only the changed events are expanded again and merged with the
+        existing entries. Entries past the previous horizon can't be trusted
+        when the list is a prefix, so the list is rebuilt if it runs short.
+        """
+        now = dt_util.now()
+        kept = [
+            item
+            for item in self._upcoming
+            if item[1].uid not in uids and item[0].end > now
+        ]
+        expansion = expand_active_after(
+            [event for event in self._calendar.events if event.uid in uids],
+            dt_util.DEFAULT_TIME_ZONE,
+            now,
+            UPCOMING_EVENTS_LIMIT,
+            self._limits,
+        )
+        changed = [
+            (timespan, _get_calendar_event(event))
+            for timespan, event in expansion.occurrences
+        ]
+        merged = list(heapq.merge(kept, changed, key=lambda item: item[0]))
+        if not self._upcoming_complete and self._upcoming:
+            horizon = self._upcoming[-1][0]
+            merged = [item for item in merged if item[0] <= horizon]
+        self._upcoming_complete = (
+            self._upcoming_complete
+            and not expansion.truncated
+            and len(merged) < UPCOMING_EVENTS_LIMIT
+        )
+        self._upcoming = merged[:UPCOMING_EVENTS_LIMIT]
+        if len(self._upcoming) < UPCOMING_EVENTS_LIMIT and not self._upcoming_complete:
+            self._rebuild_upcoming(now)
+        self._event = self._upcoming[0][1] if self._upcoming else None
+
+    def _rebuild_upcoming(self, now: datetime) -> None:
+        """Expand the next upcoming events from the whole calendar."""
+        expansion = expand_active_after(
+            self._calendar.events,
+            dt_util.DEFAULT_TIME_ZONE,
+            now,
+            UPCOMING_EVENTS_LIMIT,
+            self._limits,
+        )
+        self._upcoming = [
+            (timespan, _get_calendar_event(event))
+            for timespan, event in expansion.occurrences
+        ]
+        self._upcoming_complete = (
+            not expansion.truncated and len(self._upcoming) < UPCOMING_EVENTS_LIMIT
+        )
+
+    def _update_day_index(self, uids: set[str]) -> None:
+        """Replace the occurrences of the changed events in the day index.
+
+        Only the changed events are expanded again and only the days they
+        were or are now active on are updated. An index dropped because its
+        days had too many occurrences is built again, since the change may
+        have removed them.
+        """
+        if (index := self._day_index) is None:
+            self._build_day_index(dt_util.now())
+            return
+        if not index.covers(
+            dt_util.DEFAULT_TIME_ZONE, index.timespan.start, index.timespan.end
+        ):
+            self._build_day_index(dt_util.now())
+            return
+        index.remove(uids)
+        changed, truncated = self._occurrences(
+            index.timespan.start, index.timespan.end, uids
         )
-        if event := next(events, None):
-            self._event = _get_calendar_event(event)
-        else:
-            self._event = None
+        if truncated:
+            self._day_index = None
+            return
+        index.add(changed)
+
+    def _event_uids(self) -> set[str]:
+        """Return the uids of all events on the calendar."""
+        return {event.uid for event in self._calendar.events}
 
-    async def _async_store(self) -> None:
-        """Persist the calendar to disk."""
-        content = IcsCalendarStream.calendar_to_ics(self._calendar)
+    async def _async_store(self, uids: set[str]) -> None:
+        """Persist the calendar, or only the changed events to a database."""
+        if isinstance(self._store, LocalCalendarDatabase):
+            with self._profiler.profile():
+                header = calendar_header(self._calendar)
+                records = self._event_records(uids)
+            await self._store.async_store_events(header, uids, records)
+            return
+        self._renders.invalidate(uids)
+        with self._profiler.profile():
+            content = self._renders.render(self._calendar)
         await self._store.async_store(content)
 
+    async def async_write_database(self) -> None:
+        """Write all events to the database, replacing its contents."""
+        if not isinstance(self._store, LocalCalendarDatabase):
+            return
+        with self._profiler.profile():
+            header = calendar_header(self._calendar)
+            records = self._event_records(None)
+        await self._store.async_replace(header, records)
+
+    def _event_records(self, uids: set[str] | None) -> list[EventRecord]:
+        """Render the events with the uids, or all events, for the database."""
+        return [
+            EventRecord(uid=event.uid, ics=event_to_ics(event))
+            for event in self._calendar.events
+            if uids is None or event.uid in uids
+        ]
+
+    async def _async_calendar_changed(self, uids: set[str]) -> None:
+        """Refresh state for the changed events and persist the calendar.
+
+        The state is refreshed first so that it matches the calendar while
+        the write is in progress, or if it fails.
+        """
+        self._async_events_changed(uids)
+        await self._async_store(uids)
+
+    @callback
+    def _async_events_changed(self, uids: set[str]) -> None:
+        """Refresh state and notify listeners about the changed events."""
+        self._changes.record(uids)
+        self._compactor.compact(
+            event for event in self._calendar.events if event.uid in uids
+        )
+        self._update_upcoming(uids)
+        self._update_day_index(uids)
+        if self.hass is not None:
+            self.async_write_ha_state()
+        for update_callback in list(self._listeners):
+            update_callback(uids)
+
+    def _check_rrule(self, event: Event) -> None:
+        """Warn about a recurrence rule that will be truncated by queries."""
+        if (
+            event.rrule is not None
+            and event.dtstart is not None
+            and exceeds_limits(event.rrule, event.dtstart, self._limits)
+        ):
+            _LOGGER.warning(
+                "Recurrence rule '%s' for event '%s' produces more than %d "
+                "occurrences a year; queries will be truncated",
+                event.rrule.as_rrule_str(),
+                event.summary,
+                self._limits.max_occurrences,
+            )
+
     async def async_create_event(self, **kwargs: Any) -> dict[str, Any]:
         """Add a new event to calendar."""
-        event = Event.parse_obj(
-            {
-                EVENT_SUMMARY: kwargs[EVENT_SUMMARY],
-                EVENT_DESCRIPTION: kwargs.get(EVENT_DESCRIPTION),
-                "dtstart": kwargs[EVENT_START],
-                "dtend": kwargs[EVENT_END],
-            }
-        )
-        if rrule := kwargs.get(EVENT_RRULE):
-            event.rrule = Recur.from_rrule(rrule)
+        await self.async_wait_loaded()
+        with self._profiler.profile():
+            event = construct_event(
+                {
+                    EVENT_SUMMARY: kwargs[EVENT_SUMMARY],
+                    EVENT_DESCRIPTION: kwargs.get(EVENT_DESCRIPTION),
+                    EVENT_START: kwargs[EVENT_START],
+                    EVENT_END: kwargs[EVENT_END],
+                    EVENT_RRULE: kwargs.get(EVENT_RRULE),
+                }
+            )
+            self._check_rrule(event)
 
-        new_event = EventStore(self._calendar).add(event)
-        await self._async_store()
+            with self._edit(set()) as calendar:
+                new_event = EventStore(calendar).add(event)
+        await self._async_calendar_changed({new_event.uid})
         return {"uid": new_event.uid}
 
     async def async_update_event(self, **kwargs: Any) -> None:
         """Add a new event to calendar."""
+        await self.async_wait_loaded()
         uid = kwargs.pop("uid")
         recurrence_id = kwargs.pop("recurrence_id", None)
         range_value: Range = Range.NONE
         if recurrence_range := kwargs.pop("recurrence_range", None):
             range_value = Range[recurrence_range]
 
-        event = Event(**kwargs)
-        if rrule := kwargs.get(EVENT_RRULE):
-            event.rrule = Recur.from_rrule(rrule)
+        with self._profiler.profile():
+            event = construct_event(kwargs)
+            self._check_rrule(event)
 
-        EventStore(self._calendar).edit(
-            uid,
-            event=event,
-            recurrence_id=recurrence_id,
-            recurrence_range=range_value,
-        )
-        await self._async_store()
+            before = self._event_uids()
+            with self._edit({uid}) as calendar:
+                EventStore(calendar).edit(
+                    uid,
+                    event=event,
+                    recurrence_id=recurrence_id,
+                    recurrence_range=range_value,
+                )
+        await self._async_calendar_changed({uid} | (before ^ self._event_uids()))
 
     async def async_delete_event(
         self,
@@ -193,15 +1064,62 @@ class LocalCalendarEntity(CalendarEntity):
         recurrence_range: str | None = None,
     ) -> None:
         """Cancel an event on the calendar."""
+        await self.async_wait_loaded()
         range_value: Range = Range.NONE
         if recurrence_range == Range.THIS_AND_FUTURE:
             range_value = Range.THIS_AND_FUTURE
-        EventStore(self._calendar).delete(
-            uid,
-            recurrence_id=recurrence_id,
-            recurrence_range=range_value,
-        )
-        await self._async_store()
+        with self._profiler.profile():
+            with self._edit({uid}) as calendar:
+                EventStore(calendar).delete(
+                    uid,
+                    recurrence_id=recurrence_id,
+                    recurrence_range=range_value,
+                )
+        await self._async_calendar_changed({uid})
+
+
+def _events_by_uid(events: list[Event]) -> dict[str, list[Event]]:
+    """Return the events grouped by uid in calendar order."""
+    result: dict[str, list[Event]] = {}
+    for event in events:
+        result.setdefault(event.uid, []).append(event)
+    return result
+
+
+def _parse_changes(ics: str, base: Calendar) -> tuple[Calendar, set[str]]:
+    """Parse ics content and return the uids of events that differ from the base.
+
+    Comparing events is slow for a large calendar, so this runs in the
+    executor along with the parsing. The base is a snapshot and is not
+    modified while it is compared.
+    """
+    calendar = IcsCalendarStream.calendar_from_ics(ics)
+    if not _is_complete(ics, calendar):
+        # A file cut off part way is parsed without the remaining events
+        raise ValueError("Calendar content is incomplete")
+    existing = _events_by_uid(base.events)
+    loaded = _events_by_uid(calendar.events)
+    return calendar, {
+        uid
+        for uid in existing.keys() | loaded.keys()
+        if existing.get(uid) != loaded.get(uid)
+    }
+
+
+def _is_complete(ics: str, calendar: Calendar) -> bool:
+    """Return true if every event in the ics content was parsed."""
+    lines = ics.splitlines()
+    return "END:VCALENDAR" in lines and lines.count("BEGIN:VEVENT") == len(
+        calendar.events
+    )
+
+
+def _parse_header(ics: str) -> Calendar:
+    """Return the calendar properties from ics content, without the events."""
+    header, found, _ = ics.partition("BEGIN:VEVENT")
+    if found:
+        header += "END:VCALENDAR"
+    return IcsCalendarStream.calendar_from_ics(header)
 
 
 def _get_calendar_event(event: Event) -> LocalCalendarEvent:
@@ -216,3 +1134,16 @@ def _get_calendar_event(event: Event) -> LocalCalendarEvent:
         rrule=event.rrule.as_rrule_str() if event.rrule else None,
         recurrence_id=event.recurrence_id,
     )
+
+
+def _warm_up_windows(now: datetime) -> list[Timespan]:
+    """Return the windows for today, this week and this month."""
+    today = dt_util.start_of_local_day(now)
+    week = today - timedelta(days=today.weekday())
+    month = today.replace(day=1)
+    next_month = dt_util.start_of_local_day((month + timedelta(days=32)).replace(day=1))
+    return [
+        Timespan.of(today, dt_util.start_of_local_day(today + timedelta(days=1))),
+        Timespan.of(week, dt_util.start_of_local_day(week + timedelta(days=7))),
+        Timespan.of(month, next_month),
+    ]
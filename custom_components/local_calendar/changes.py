@@ -0,0 +1,53 @@
+"""Track changes to events so clients can sync incrementally.
+
+Every change to the calendar increments a sequence number, and the uids of
+the changed events are kept in a bounded log. A client remembers the sync
+token returned with its last sync and asks for the events changed since.
+Tokens include an identifier of the log so that a token from before a
+restart, or one that has fallen out of the log, requires a full resync.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections import deque
+
+# Number of changed uids kept in the log
+CHANGE_LOG_SIZE = 1000
+
+
+class ChangeLog:
+    """A bounded log of changed event uids."""
+
+    def __init__(self, size: int = CHANGE_LOG_SIZE) -> None:
+        """Initialize ChangeLog."""
+        self._log_id = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._entries: deque[tuple[int, str]] = deque(maxlen=size)
+        self._dropped = 0
+        """Latest sequence with changes that are no longer in the log."""
+
+    @property
+    def sync_token(self) -> str:
+        """Return the token for the current state of the calendar."""
+        return f"{self._log_id}-{self._sequence}"
+
+    def record(self, uids: set[str]) -> None:
+        """Record a change to the events with the specified uids."""
+        self._sequence += 1
+        for uid in uids:
+            if len(self._entries) == self._entries.maxlen:
+                self._dropped = self._entries[0][0]
+            self._entries.append((self._sequence, uid))
+
+    def changes_since(self, sync_token: str) -> set[str] | None:
+        """Return the uids changed since the token, or None to resync."""
+        log_id, _, value = sync_token.partition("-")
+        if log_id != self._log_id or not value.isdigit():
+            return None
+        sequence = int(value)
+        if sequence > self._sequence or sequence < self._dropped:
+            return None
+        return {
+            uid for entry_sequence, uid in self._entries if entry_sequence > sequence
+        }
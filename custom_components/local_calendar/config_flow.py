@@ -6,9 +6,29 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 
-from .const import CONF_CALENDAR_NAME, DOMAIN
+from .const import (
+    COMPRESSION_FORMATS,
+    COMPRESSION_NONE,
+    CONF_CALENDAR_NAME,
+    CONF_MAX_EXPANSION_TIME,
+    CONF_MAX_OCCURRENCES,
+    CONF_PARALLEL_EXPANSION_THRESHOLD,
+    CONF_QUERY_CHUNK_SIZE,
+    CONF_QUERY_CHUNK_TIME,
+    CONF_STORAGE_COMPRESSION,
+    CONF_STORAGE_ENGINE,
+    DEFAULT_MAX_EXPANSION_TIME,
+    DEFAULT_MAX_OCCURRENCES,
+    DEFAULT_PARALLEL_EXPANSION_THRESHOLD,
+    DEFAULT_QUERY_CHUNK_SIZE,
+    DEFAULT_QUERY_CHUNK_TIME,
+    DOMAIN,
+    ENGINE_ICS,
+    STORAGE_ENGINES,
+)
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
@@ -34,3 +54,74 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_create_entry(
             title=user_input[CONF_CALENDAR_NAME], data=user_input
         )
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Create the options flow."""
+        return OptionsFlowHandler(config_entry)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Local Calendar options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_STORAGE_ENGINE,
+                        default=options.get(CONF_STORAGE_ENGINE, ENGINE_ICS),
+                    ): vol.In(STORAGE_ENGINES),
+                    vol.Optional(
+                        CONF_STORAGE_COMPRESSION,
+                        default=options.get(CONF_STORAGE_COMPRESSION, COMPRESSION_NONE),
+                    ): vol.In(COMPRESSION_FORMATS),
+                    vol.Optional(
+                        CONF_MAX_OCCURRENCES,
+                        default=options.get(
+                            CONF_MAX_OCCURRENCES, DEFAULT_MAX_OCCURRENCES
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Optional(
+                        CONF_MAX_EXPANSION_TIME,
+                        default=options.get(
+                            CONF_MAX_EXPANSION_TIME, DEFAULT_MAX_EXPANSION_TIME
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.01)),
+                    vol.Optional(
+                        CONF_QUERY_CHUNK_SIZE,
+                        default=options.get(
+                            CONF_QUERY_CHUNK_SIZE, DEFAULT_QUERY_CHUNK_SIZE
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Optional(
+                        CONF_QUERY_CHUNK_TIME,
+                        default=options.get(
+                            CONF_QUERY_CHUNK_TIME, DEFAULT_QUERY_CHUNK_TIME
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Optional(
+                        CONF_PARALLEL_EXPANSION_THRESHOLD,
+                        default=options.get(
+                            CONF_PARALLEL_EXPANSION_THRESHOLD,
+                            DEFAULT_PARALLEL_EXPANSION_THRESHOLD,
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                }
+            ),
+        )
@@ -2,4 +2,49 @@
 
 DOMAIN = "local_calendar"
 
+# Seconds taken to import the calendar platform when first set up
+DATA_IMPORT_SECONDS = f"{DOMAIN}_import_seconds"
+
 CONF_CALENDAR_NAME = "calendar_name"
+
+CONF_STORAGE_ENGINE = "storage_engine"
+ENGINE_ICS = "ics"
+ENGINE_SQLITE = "sqlite"
+STORAGE_ENGINES = [ENGINE_ICS, ENGINE_SQLITE]
+
+CONF_STORAGE_COMPRESSION = "storage_compression"
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_BZ2 = "bz2"
+COMPRESSION_LZMA = "lzma"
+COMPRESSION_FORMATS = [
+    COMPRESSION_NONE,
+    COMPRESSION_GZIP,
+    COMPRESSION_BZ2,
+    COMPRESSION_LZMA,
+]
+
+CONF_MAX_OCCURRENCES = "max_occurrences"
+DEFAULT_MAX_OCCURRENCES = 10000
+
+CONF_MAX_EXPANSION_TIME = "max_expansion_time"
+DEFAULT_MAX_EXPANSION_TIME = 1.0
+
+CONF_QUERY_CHUNK_SIZE = "query_chunk_size"
+DEFAULT_QUERY_CHUNK_SIZE = 500
+
+# Milliseconds spent expanding a query before yielding to the event loop
+CONF_QUERY_CHUNK_TIME = "query_chunk_time"
+DEFAULT_QUERY_CHUNK_TIME = 20
+
+# Queries are expanded in a process pool when the number of recurring events
+# times the days in the range exceeds the threshold, zero disables the pool
+CONF_PARALLEL_EXPANSION_THRESHOLD = "parallel_expansion_threshold"
+DEFAULT_PARALLEL_EXPANSION_THRESHOLD = 0
+
+# Periods and groups of occurrence statistics
+PERIOD_DAY = "day"
+PERIOD_WEEK = "week"
+PERIOD_MONTH = "month"
+PERIODS = [PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH]
+GROUP_BY = ["summary", "location"]
@@ -0,0 +1,201 @@
+"""SQLite storage engine for the Local Calendar integration.
+
+Each event is stored as its own rendered VEVENT block in a table indexed by
+uid, so a change to an event only writes the rows for that event rather than
+the whole calendar file. The remaining calendar properties and timezones are
+stored as a VCALENDAR without events. The database is not queried by time:
+the whole calendar is still loaded into memory and queries expand the
+recurring events there, the database only reduces the cost of writes.
+
+The calendar file and the database are kept in sync when switching between
+storage engines: whichever was modified last is copied into the other.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from collections.abc import Callable, Coroutine, Iterable, Iterator
+from contextlib import closing, contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .store import join_calendar, read_calendar
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS calendar ("
+    " id INTEGER PRIMARY KEY CHECK (id = 0), ics TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS events (uid TEXT NOT NULL, ics TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS events_uid ON events (uid)",
+)
+
+
+@dataclass
+class EventRecord:
+    """A rendered event stored in the database."""
+
+    uid: str
+    ics: str
+
+
+@dataclass
+class DatabaseStats:
+    """Statistics about the calendar database."""
+
+    loads: int = 0
+    stores: int = 0
+    events_written: int = 0
+    events_deleted: int = 0
+    load_seconds: float = 0.0
+    store_seconds: float = 0.0
+
+
+class LocalCalendarDatabase:
+    """Local calendar storage in a SQLite database."""
+
+    def __init__(self, hass: HomeAssistant, path: Path, import_path: Path) -> None:
+        """Initialize LocalCalendarDatabase.
+
+        The ics file at the import path is loaded when it is newer than the
+        database, for example when the database is first created or the ics
+        storage engine was used since.
+        """
+        self._hass = hass
+        self._path = path
+        self._import_path = import_path
+        self._lock = asyncio.Lock()
+        self._initialized = False
+        self._schema_created = False
+        self._stats = DatabaseStats()
+
+    @property
+    def initialized(self) -> bool:
+        """Return true if the calendar has been written to the database."""
+        return self._initialized
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return statistics about the storage for diagnostics."""
+        return {"engine": "sqlite", **asdict(self._stats)}
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open the database in a transaction, creating the schema if needed."""
+        with closing(sqlite3.connect(self._path)) as conn:
+            if not self._schema_created:
+                with conn:
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+                self._schema_created = True
+            with conn:
+                yield conn
+
+    async def async_load(self) -> str:
+        """Load the calendar from the database."""
+        async with self._lock:
+            return await self._hass.async_add_executor_job(self._load)
+
+    def _load(self) -> str:
+        """Load the calendar, or the ics file to import if it is newer."""
+        start = time.perf_counter()
+        import_file = _is_newer(self._import_path, self._path)
+        with self._connect() as conn:
+            row = conn.execute("SELECT ics FROM calendar").fetchone()
+            events = [ics for (ics,) in conn.execute("SELECT ics FROM events")]
+        self._stats.loads += 1
+        self._stats.load_seconds += time.perf_counter() - start
+        self._initialized = row is not None and not import_file
+        if import_file:
+            _LOGGER.debug("Importing %s into %s", self._import_path, self._path)
+            return read_calendar(self._import_path)
+        if row is not None:
+            return join_calendar(row[0], events)
+        return ""
+
+    async def async_load_if_changed(self) -> str | None:
+        """Return None, the database is only modified by this integration."""
+        return None
+
+    @callback
+    def async_watch(  # pylint: disable=unused-argument
+        self, on_change: Callable[[], Coroutine[Any, Any, None]]
+    ) -> CALLBACK_TYPE:
+        """Watch for changes, the database is only modified by this integration."""
+        return lambda: None
+
+    async def async_replace(self, header: str, records: Iterable[EventRecord]) -> None:
+        """Replace the entire calendar in the database."""
+        async with self._lock:
+            await self._hass.async_add_executor_job(
+                self._store, header, None, list(records)
+            )
+
+    async def async_store_events(
+        self, header: str, uids: set[str], records: Iterable[EventRecord]
+    ) -> None:
+        """Replace the rows for the events with the specified uids."""
+        async with self._lock:
+            await self._hass.async_add_executor_job(
+                self._store, header, uids, list(records)
+            )
+
+    def _store(
+        self, header: str, uids: set[str] | None, records: list[EventRecord]
+    ) -> None:
+        """Write the calendar header and events, all events if uids is None."""
+        start = time.perf_counter()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO calendar (id, ics) VALUES (0, ?)", (header,)
+            )
+            if uids is None:
+                cursor = conn.execute("DELETE FROM events")
+            else:
+                cursor = conn.executemany(
+                    "DELETE FROM events WHERE uid = ?", [(uid,) for uid in uids]
+                )
+            self._stats.events_deleted += max(cursor.rowcount, 0)
+            conn.executemany(
+                "INSERT INTO events (uid, ics) VALUES (?, ?)",
+                [(record.uid, record.ics) for record in records],
+            )
+        self._initialized = True
+        self._stats.stores += 1
+        self._stats.events_written += len(records)
+        self._stats.store_seconds += time.perf_counter() - start
+
+
+def export_if_newer(path: Path, export_path: Path) -> str | None:
+    """Return the calendar in the database if it is newer than the ics file.
+
+    Used when switching back to the ics storage engine, so changes made
+    while the database was used are not lost.
+    """
+    if not _is_newer(path, export_path):
+        return None
+    with closing(sqlite3.connect(path)) as conn:
+        try:
+            row = conn.execute("SELECT ics FROM calendar").fetchone()
+        except sqlite3.OperationalError:
+            # The schema was never created
+            return None
+        events = [ics for (ics,) in conn.execute("SELECT ics FROM events")]
+    if row is None:
+        return None
+    return join_calendar(row[0], events)
+
+
+def _is_newer(path: Path, other: Path) -> bool:
+    """Return true if the file exists and was modified after the other file."""
+    if not path.exists():
+        return False
+    if not other.exists():
+        return True
+    return path.stat().st_mtime_ns > other.stat().st_mtime_ns
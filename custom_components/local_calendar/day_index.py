@@ -0,0 +1,130 @@
+"""Index of event occurrences by local day.
+
+Dashboards mostly ask for today or this week. Occurrences over a range of
+days are bucketed by the local day they are active on, so a query within the
+range only looks up the buckets for its days rather than expanding the
+calendar. An occurrence spanning several days is kept in each of their
+buckets. The buckets depend on the time zone, so the index is only valid for
+the time zone it was built in.
+"""
+
+from __future__ import annotations
+
+import datetime
+import heapq
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from ical.timespan import Timespan
+
+# An occurrence is the timespan and an event with a uid
+Occurrence = tuple[Timespan, Any]
+
+
+class DayIndex:
+    """Occurrences bucketed by local day over a range of days."""
+
+    def __init__(self, tzinfo: datetime.tzinfo, timespan: Timespan) -> None:
+        """Initialize DayIndex for the days of the timespan."""
+        self._tzinfo = tzinfo
+        self._timespan = timespan
+        self._first_day = self._day(timespan.start)
+        self._last_day = self._last_day_of(timespan)
+        self._buckets: dict[datetime.date, list[Occurrence]] = {}
+        self._days_by_uid: dict[str, set[datetime.date]] = {}
+
+    @property
+    def timespan(self) -> Timespan:
+        """Return the range of time covered by the index."""
+        return self._timespan
+
+    def covers(
+        self, tzinfo: datetime.tzinfo, start: datetime.datetime, end: datetime.datetime
+    ) -> bool:
+        """Return true if the index can answer a query for the range."""
+        timespan = Timespan.of(start, end)
+        return (
+            tzinfo == self._tzinfo
+            and self._timespan.start <= timespan.start
+            and timespan.end <= self._timespan.end
+        )
+
+    def add(self, occurrences: Iterable[Occurrence]) -> None:
+        """Add the occurrences to the buckets for the days they are active."""
+        affected: set[datetime.date] = set()
+        for item in occurrences:
+            days = self._days_by_uid.setdefault(item[1].uid, set())
+            for day in self._days_of(item[0]):
+                self._buckets.setdefault(day, []).append(item)
+                days.add(day)
+                affected.add(day)
+        for day in affected:
+            self._buckets[day].sort(key=lambda item: item[0])
+
+    def remove(self, uids: Iterable[str]) -> set[datetime.date]:
+        """Remove the occurrences of the events, returning the affected days."""
+        uids = set(uids)
+        affected: set[datetime.date] = set()
+        for uid in uids:
+            affected |= self._days_by_uid.pop(uid, set())
+        for day in affected:
+            self._buckets[day] = [
+                item for item in self._buckets[day] if item[1].uid not in uids
+            ]
+            if not self._buckets[day]:
+                del self._buckets[day]
+        return affected
+
+    def lookup(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> list[Occurrence]:
+        """Return the occurrences overlapping the range in timeline order."""
+        timespan = Timespan.of(start, end)
+        buckets = [
+            self._buckets.get(day, [])
+            for day in _days(self._day(timespan.start), self._last_day_of(timespan))
+        ]
+        seen: set[int] = set()
+        result = []
+        for item in heapq.merge(*buckets, key=lambda item: item[0]):
+            if id(item) in seen or not item[0].intersects(timespan):
+                continue
+            seen.add(id(item))
+            result.append(item)
+        return result
+
+    def report(self) -> dict[str, Any]:
+        """Return the size of the index for diagnostics."""
+        return {
+            "start": self._timespan.start.isoformat(),
+            "end": self._timespan.end.isoformat(),
+            "days": len(self._buckets),
+            "occurrences": len(
+                {id(item) for bucket in self._buckets.values() for item in bucket}
+            ),
+        }
+
+    def _day(self, value: datetime.datetime) -> datetime.date:
+        """Return the local day of the time."""
+        return value.astimezone(self._tzinfo).date()
+
+    def _last_day_of(self, timespan: Timespan) -> datetime.date:
+        """Return the last local day the timespan is active, the end is exclusive."""
+        if timespan.end <= timespan.start:
+            return self._day(timespan.start)
+        return self._day(timespan.end - datetime.timedelta(microseconds=1))
+
+    def _days_of(self, timespan: Timespan) -> Iterator[datetime.date]:
+        """Return the days of the index the timespan is active."""
+        return _days(
+            max(self._day(timespan.start), self._first_day),
+            min(self._last_day_of(timespan), self._last_day),
+        )
+
+
+def _days(first: datetime.date, last: datetime.date) -> Iterator[datetime.date]:
+    """Return the days from first to last inclusive."""
+    day = first
+    while day <= last:
+        yield day
+        day += datetime.timedelta(days=1)
@@ -0,0 +1,43 @@
+"""Diagnostics support for Local Calendar."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_component import EntityComponent
+
+from .const import DATA_IMPORT_SECONDS, DOMAIN
+
+if TYPE_CHECKING:
+    # Diagnostics are loaded with the integration, before the platform
+    from .calendar import LocalCalendarEntity
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    component: EntityComponent = hass.data["calendar"]
+    entities = {}
+    entity: LocalCalendarEntity
+    for entity in component.entities:
+        if (
+            entity.platform is None
+            or entity.platform.platform_name != DOMAIN
+            or entity.platform.config_entry is not config_entry
+        ):
+            continue
+        entities[entity.entity_id] = {
+            "memory": entity.memory_report(),
+            "series_compaction": entity.series_compaction,
+            "query_cache": entity.cache_report(),
+            "expansion": entity.expansion_report(),
+            "render_cache": entity.render_report(),
+        }
+    return {
+        "storage": store.stats,
+        "import_seconds": hass.data.get(DATA_IMPORT_SECONDS),
+        "entities": entities,
+    }
@@ -0,0 +1,290 @@
+"""Bounded expansion of recurring events into occurrences.
+
+A frequent recurrence rule may produce a huge number of occurrences for a
+wide query, and the calendar timeline also iterates over every occurrence
+before the start of a query. Expansion runs on the event loop so it is
+bounded by a number of occurrences and a time limit, and stops early with a
+truncation flag rather than blocking the loop. Range queries are also split
+into chunks that yield to the event loop in between.
+"""
+
+from __future__ import annotations
+
+import datetime
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Protocol
+
+from dateutil import rrule
+from ical.event import Event
+from ical.iter import (
+    MergedIterable,
+    RecurIterable,
+    SortableItem,
+    SortableItemValue,
+    SortedItemIterable,
+)
+from ical.timeline import RecurAdapter
+from ical.timespan import Timespan
+from ical.types import Recur
+
+from .const import (
+    DEFAULT_MAX_EXPANSION_TIME,
+    DEFAULT_MAX_OCCURRENCES,
+    DEFAULT_QUERY_CHUNK_SIZE,
+    DEFAULT_QUERY_CHUNK_TIME,
+)
+
+# Rules are checked for the number of occurrences produced in this period
+RULE_CHECK_PERIOD = datetime.timedelta(days=365)
+
+
+@dataclass(frozen=True)
+class ExpansionLimits:
+    """Limits on the expansion of occurrences for a single query."""
+
+    max_occurrences: int = DEFAULT_MAX_OCCURRENCES
+    max_seconds: float = DEFAULT_MAX_EXPANSION_TIME
+
+
+@dataclass(frozen=True)
+class QueryChunks:
+    """Size of the chunks of a query between yielding to the event loop."""
+
+    size: int = DEFAULT_QUERY_CHUNK_SIZE
+    """Number of timeline items expanded in a chunk."""
+
+    seconds: float = DEFAULT_QUERY_CHUNK_TIME / 1000
+    """Time spent expanding in a chunk."""
+
+
+@dataclass
+class Expansion:
+    """Occurrences returned by a query in timeline order."""
+
+    occurrences: list[tuple[Timespan, Event]] = field(default_factory=list)
+    truncated: bool = False
+    """True if a limit was reached before the query was complete."""
+
+
+def timeline_items(
+    events: Iterable[Event], tzinfo: datetime.tzinfo, copy_instances: bool = True
+) -> Iterable[SortableItem[Timespan, Event]]:
+    """Return the occurrences of the events sorted by timespan.
+
+    This matches the calendar timeline, but exposes the sortable items so
+    that every occurrence can be checked against the limits including those
+    skipped before the start of a query. Without copying instances, the item
+    for an occurrence of a recurring event is the series event itself, for
+    when only the timespan and content of occurrences are needed.
+    """
+    events = list(events)
+
+    def single_items() -> Iterator[SortableItem[Timespan, Event]]:
+        for event in events:
+            if not event.rrule and not event.rdate:
+                yield SortableItemValue(event.timespan_of(tzinfo), event)
+
+    iters: list[Iterable[SortableItem[Timespan, Event]]] = [
+        SortedItemIterable(single_items, tzinfo)
+    ]
+    for event in events:
+        if not event.rrule and not event.rdate:
+            continue
+        ruleset = rrule.rruleset()
+        if event.rrule:
+            ruleset.rrule(event.rrule.as_rrule(event.start))
+        for rdate in event.rdate:
+            ruleset.rdate(rdate)
+        for exdate in event.exdate:
+            if not isinstance(exdate, datetime.datetime):
+                # Convert to datetime matching dateutil's logic
+                exdate = datetime.datetime.fromordinal(exdate.toordinal())
+            ruleset.exdate(exdate)
+        adapter: _InstanceAdapter
+        if copy_instances:
+            adapter = RecurAdapter(event)
+        else:
+            adapter = _SeriesAdapter(event)
+        iters.append(RecurIterable(adapter.get, ruleset))
+    return MergedIterable(iters)
+
+
+class _InstanceAdapter(Protocol):
+    """Return the timeline item for each instance of a recurring event."""
+
+    def get(
+        self, dtstart: datetime.datetime | datetime.date
+    ) -> SortableItem[Timespan, Event]:
+        """Return the item for the instance starting at dtstart."""
+
+
+class _SeriesAdapter:
+    """Return the series event for each instance of a recurring event."""
+
+    def __init__(self, event: Event) -> None:
+        """Initialize _SeriesAdapter."""
+        self._event = event
+        self._duration = event.computed_duration
+        self._is_all_day = not isinstance(event.dtstart, datetime.datetime)
+
+    def get(
+        self, dtstart: datetime.datetime | datetime.date
+    ) -> SortableItem[Timespan, Event]:
+        """Return the item for the instance, matching the recurrence adapter."""
+        if self._is_all_day and isinstance(dtstart, datetime.datetime):
+            dtstart = datetime.date.fromordinal(dtstart.toordinal())
+        return SortableItemValue(
+            Timespan.of(dtstart, dtstart + self._duration), self._event
+        )
+
+
+def expand_overlapping(
+    events: Iterable[Event],
+    tzinfo: datetime.tzinfo,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    limits: ExpansionLimits,
+) -> Expansion:
+    """Return occurrences overlapping the time range, the end is exclusive."""
+    expansion = Expansion()
+    _run(
+        _overlapping_steps(events, tzinfo, start, end, limits, expansion),
+        expansion,
+        limits,
+    )
+    return expansion
+
+
+async def async_expand_overlapping(
+    events: Iterable[Event],
+    tzinfo: datetime.tzinfo,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    limits: ExpansionLimits,
+    chunks: QueryChunks,
+    async_yield: Callable[[], Awaitable[None]],
+) -> Expansion:
+    """Return occurrences overlapping the time range, yielding between chunks.
+
+    The time spent waiting for other tasks does not count towards the limits.
+    """
+    expansion = Expansion()
+    await _async_run(
+        _overlapping_steps(events, tzinfo, start, end, limits, expansion),
+        expansion,
+        limits,
+        chunks,
+        async_yield,
+    )
+    return expansion
+
+
+def expand_active_after(
+    events: Iterable[Event],
+    tzinfo: datetime.tzinfo,
+    instant: datetime.datetime,
+    count: int,
+    limits: ExpansionLimits,
+) -> Expansion:
+    """Return the next occurrences active after the specified time."""
+    expansion = Expansion()
+    _run(
+        _active_after_steps(events, tzinfo, instant, count, expansion),
+        expansion,
+        limits,
+    )
+    return expansion
+
+
+def _overlapping_steps(
+    events: Iterable[Event],
+    tzinfo: datetime.tzinfo,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    limits: ExpansionLimits,
+    expansion: Expansion,
+) -> Iterator[None]:
+    """Add overlapping occurrences to the expansion, one timeline item per step."""
+    timespan = Timespan.of(start, end)
+    for item in timeline_items(events, tzinfo):
+        if item.key.intersects(timespan):
+            if len(expansion.occurrences) >= limits.max_occurrences:
+                expansion.truncated = True
+                return
+            event = item.item
+            expansion.occurrences.append((event.timespan_of(tzinfo), event))
+        elif item.key > timespan:
+            return
+        yield
+
+
+def _active_after_steps(
+    events: Iterable[Event],
+    tzinfo: datetime.tzinfo,
+    instant: datetime.datetime,
+    count: int,
+    expansion: Expansion,
+) -> Iterator[None]:
+    """Add occurrences active after the instant, one timeline item per step."""
+    for item in timeline_items(events, tzinfo):
+        if len(expansion.occurrences) >= count:
+            return
+        if item.key.end > instant:
+            event = item.item
+            expansion.occurrences.append((event.timespan_of(tzinfo), event))
+        yield
+
+
+def _run(steps: Iterator[None], expansion: Expansion, limits: ExpansionLimits) -> None:
+    """Run the expansion steps until complete or the time limit is reached."""
+    deadline = time.monotonic() + limits.max_seconds
+    for _ in steps:
+        if time.monotonic() > deadline:
+            expansion.truncated = True
+            return
+
+
+async def _async_run(
+    steps: Iterator[None],
+    expansion: Expansion,
+    limits: ExpansionLimits,
+    chunks: QueryChunks,
+    async_yield: Callable[[], Awaitable[None]],
+) -> None:
+    """Run the expansion steps in chunks, yielding to the event loop in between."""
+    elapsed = 0.0
+    chunk_start = time.monotonic()
+    chunk_steps = 0
+    for _ in steps:
+        chunk_steps += 1
+        chunk_elapsed = time.monotonic() - chunk_start
+        if elapsed + chunk_elapsed > limits.max_seconds:
+            expansion.truncated = True
+            return
+        if chunk_steps >= chunks.size or chunk_elapsed >= chunks.seconds:
+            elapsed += chunk_elapsed
+            await async_yield()
+            chunk_start = time.monotonic()
+            chunk_steps = 0
+
+
+def exceeds_limits(
+    rule: Recur, dtstart: datetime.date | datetime.datetime, limits: ExpansionLimits
+) -> bool:
+    """Return true if the rule produces too many occurrences for a single query."""
+    period_end = _as_datetime(dtstart) + RULE_CHECK_PERIOD
+    occurrences = islice(rule.as_rrule(dtstart), limits.max_occurrences + 1)
+    return (
+        sum(1 for value in occurrences if _as_datetime(value) < period_end)
+        > limits.max_occurrences
+    )
+
+
+def _as_datetime(value: datetime.date | datetime.datetime) -> datetime.datetime:
+    """Convert a date to a datetime matching dateutil's logic."""
+    if not isinstance(value, datetime.datetime):
+        return datetime.datetime.fromordinal(value.toordinal())
+    return value
@@ -0,0 +1,89 @@
+"""Reduce the memory footprint of events on a calendar.
+
+Calendars often have many events with the same summary, location or
+recurrence rule. Each parsed event holds its own copy of these values, so
+repeated strings are interned and identical recurrence rules are shared
+between events.
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterable
+from typing import Any
+
+from ical.event import Event
+from ical.types import Recur
+
+INTERNED_FIELDS = ("summary", "description", "location")
+
+
+class EventCompactor:
+    """Shares repeated values between events."""
+
+    def __init__(self) -> None:
+        """Initialize EventCompactor."""
+        # Rules are kept after their events are deleted, the number of
+        # distinct rules on a calendar is expected to be small.
+        self._rules: dict[str, Recur] = {}
+        self._bytes_saved = 0
+        self._values_shared = 0
+
+    def compact(self, events: Iterable[Event]) -> None:
+        """Share repeated strings and recurrence rules for the events.
+
+        Values are replaced in the model dict directly since assignment would
+        run validation on the whole event.
+        """
+        for event in events:
+            values = event.__dict__
+            for field in INTERNED_FIELDS:
+                # sys.intern rejects str subclasses, so isinstance is not enough
+                # pylint: disable-next=unidiomatic-typecheck
+                if (value := values.get(field)) and type(value) is str:
+                    self._share(values, field, sys.intern(value))
+            if (rrule := values.get("rrule")) is not None:
+                shared = self._rules.setdefault(rrule.as_rrule_str(), rrule)
+                self._share(values, "rrule", shared)
+
+    def _share(self, values: dict[str, Any], field: str, shared: Any) -> None:
+        """Replace the value with the shared instance."""
+        if (value := values[field]) is shared:
+            return
+        self._bytes_saved += _deep_getsizeof(value, set())
+        self._values_shared += 1
+        values[field] = shared
+
+    def report(self, events: list[Event]) -> dict[str, Any]:
+        """Return a memory usage report for the events."""
+        seen: set[int] = set()
+        return {
+            "events": len(events),
+            "estimated_bytes": sum(_deep_getsizeof(event, seen) for event in events),
+            "values_shared": self._values_shared,
+            "bytes_saved": self._bytes_saved,
+            "recurring_events": sum(1 for event in events if event.rrule),
+            "distinct_rrules": len(
+                {id(event.rrule) for event in events if event.rrule}
+            ),
+        }
+
+
+def _deep_getsizeof(value: Any, seen: set[int]) -> int:
+    """Return an estimate of the memory used by a value, counting shared objects once."""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float)):
+        return size
+    if isinstance(value, dict):
+        return size + sum(
+            _deep_getsizeof(key, seen) + _deep_getsizeof(item, seen)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return size + sum(_deep_getsizeof(item, seen) for item in value)
+    if hasattr(value, "__dict__"):
+        return size + _deep_getsizeof(value.__dict__, seen)
+    return size
@@ -0,0 +1,122 @@
+"""Expansion of wide queries in a process pool.
+
+Expanding many recurring events over a range of years is CPU bound and
+limited by the GIL even in a thread. Above a threshold the events are split
+between worker processes that each expand their share of the series, and the
+occurrences are merged back in timeline order.
+
+Workers are spawned rather than forked since the Home Assistant process runs
+many threads. Home Assistant is imported before the integration in each
+worker, matching the order modules are loaded in Home Assistant itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import heapq
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any
+
+from ical.event import Event
+
+from .expansion import Expansion, ExpansionLimits, expand_overlapping
+
+# Imported by each worker before unpickling the first expansion
+WORKER_IMPORT = "homeassistant.config_entries"
+
+
+class ParallelExpansion:
+    """Splits the expansion of wide queries between worker processes."""
+
+    def __init__(self, threshold: int, workers: int | None = None) -> None:
+        """Initialize ParallelExpansion.
+
+        The threshold is compared to the number of recurring events times the
+        number of days in the range of a query.
+        """
+        self._threshold = threshold
+        self._workers = workers or min(os.cpu_count() or 1, 4)
+        self._pool: ProcessPoolExecutor | None = None
+        self._queries = 0
+
+    def should_split(
+        self, events: list[Event], start: datetime.datetime, end: datetime.datetime
+    ) -> bool:
+        """Return true if the query is large enough to split between workers."""
+        recurring = sum(1 for event in events if event.rrule or event.rdate)
+        days = max((end - start).days, 1)
+        return recurring > 1 and recurring * days > self._threshold
+
+    async def async_expand(
+        self,
+        events: list[Event],
+        tzinfo: datetime.tzinfo,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        limits: ExpansionLimits,
+    ) -> Expansion:
+        """Return occurrences overlapping the time range, expanded by the workers."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=importlib.import_module,
+                initargs=(WORKER_IMPORT,),
+            )
+        self._queries += 1
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self._pool, expand_overlapping, part, tzinfo, start, end, limits
+                )
+                for part in _split(events, self._workers)
+            )
+        )
+        merged = heapq.merge(
+            *(result.occurrences for result in results), key=lambda item: item[0]
+        )
+        expansion = Expansion(
+            occurrences=list(merged),
+            truncated=any(result.truncated for result in results),
+        )
+        if len(expansion.occurrences) > limits.max_occurrences:
+            del expansion.occurrences[limits.max_occurrences :]
+            expansion.truncated = True
+        return expansion
+
+    def report(self) -> dict[str, Any]:
+        """Return the process pool settings and usage for diagnostics."""
+        return {
+            "threshold": self._threshold,
+            "workers": self._workers,
+            "queries": self._queries,
+        }
+
+    async def async_shutdown(self) -> None:
+        """Stop the worker processes and wait for them to exit."""
+        if (pool := self._pool) is None:
+            return
+        self._pool = None
+        await asyncio.get_running_loop().run_in_executor(
+            None, partial(pool.shutdown, wait=True, cancel_futures=True)
+        )
+
+
+def _split(events: list[Event], parts: int) -> list[list[Event]]:
+    """Split the events so each part has a similar number of recurring events."""
+    split: list[list[Event]] = [[] for _ in range(parts)]
+    recurring = 0
+    for event in events:
+        if event.rrule or event.rdate:
+            split[recurring % parts].append(event)
+            recurring += 1
+        else:
+            # Single events are cheap to expand
+            split[0].append(event)
+    return [part for part in split if part]
@@ -0,0 +1,100 @@
+"""On demand profiling of calendar operations."""
+
+from __future__ import annotations
+
+import cProfile
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CalendarProfiler:
+    """Captures a cProfile of calendar operations to a pstats file.
+
+    Profiling is only enabled inside the sections of code marked with
+    `profile()`, so time spent by unrelated tasks on the event loop while a
+    calendar operation is waiting is not captured.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize CalendarProfiler."""
+        self._hass = hass
+        self._profile: cProfile.Profile | None = None
+        self._path: str | None = None
+        self._remaining: int | None = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(
+        self, path: str, duration: timedelta, operations: int | None = None
+    ) -> None:
+        """Start capturing a profile for a duration or number of operations."""
+        if self._profile is not None:
+            raise HomeAssistantError(f"Already capturing a profile to {self._path}")
+        _LOGGER.info("Starting profile of calendar operations to %s", path)
+        self._profile = cProfile.Profile()
+        self._path = path
+        self._remaining = operations
+        self._unsub_timer = async_call_later(self._hass, duration, self._async_timeout)
+
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        """Profile the enclosed operation when a profile is being captured."""
+        if (profile := self._profile) is None:
+            yield
+            return
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            # The profile may have finished, and another started, meanwhile
+            if self._profile is profile and self._remaining is not None:
+                self._remaining -= 1
+                if self._remaining <= 0:
+                    self._async_finish()
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Stop profiling while the enclosed code yields to other tasks."""
+        if (profile := self._profile) is None:
+            yield
+            return
+        profile.disable()
+        try:
+            yield
+        finally:
+            if self._profile is profile:
+                profile.enable()
+
+    @callback
+    def _async_timeout(self, now: datetime) -> None:
+        """Stop the profile when the duration has elapsed."""
+        self._unsub_timer = None
+        self._async_finish()
+
+    @callback
+    def _async_finish(self) -> None:
+        """Stop capturing and write the profile to disk."""
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if (profile := self._profile) is None or (path := self._path) is None:
+            return
+        self._profile = None
+        self._path = None
+        self._remaining = None
+        self._hass.async_add_executor_job(_write_stats, profile, path)
+
+
+def _write_stats(profile: cProfile.Profile, path: str) -> None:
+    """Write the pstats output for the profile."""
+    profile.dump_stats(path)
+    _LOGGER.info("Wrote profile of calendar operations to %s", path)
@@ -0,0 +1,94 @@
+"""The last known events of the calendar, restored at startup.
+
+Parsing a large calendar can take a while, so the entity is added with the
+current and next event saved by the restore state helper on shutdown. The
+state is correct as soon as Home Assistant starts and the calendar is loaded
+in the background. A restored event is only valid until it ends.
+"""
+
+from __future__ import annotations
+
+import datetime
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.calendar import CalendarEvent
+from homeassistant.helpers.restore_state import ExtraStoredData
+from homeassistant.util import dt as dt_util
+from ical.timespan import Timespan
+
+# The current and next event are enough to report the state
+RESTORE_EVENTS_LIMIT = 2
+
+ATTR_EVENTS = "events"
+ATTR_TIMESPAN = "timespan"
+RESTORED_FIELDS = ("summary", "location", "uid")
+
+
+@dataclass
+class RestoredEvents(ExtraStoredData):
+    """The upcoming events saved with the state of the entity."""
+
+    events: list[dict[str, Any]]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a dict representation of the events."""
+        return {ATTR_EVENTS: self.events}
+
+    @classmethod
+    def from_occurrences(
+        cls, occurrences: list[tuple[Timespan, CalendarEvent]]
+    ) -> RestoredEvents:
+        """Return the first upcoming events to save."""
+        return cls(
+            [
+                {
+                    **{name: getattr(event, name, None) for name in RESTORED_FIELDS},
+                    "start": event.start.isoformat(),
+                    "end": event.end.isoformat(),
+                    ATTR_TIMESPAN: [
+                        timespan.start.isoformat(),
+                        timespan.end.isoformat(),
+                    ],
+                }
+                for timespan, event in occurrences[:RESTORE_EVENTS_LIMIT]
+            ]
+        )
+
+    def occurrences(
+        self, now: datetime.datetime
+    ) -> list[tuple[Timespan, dict[str, Any]]]:
+        """Return the events that have not ended with the values of each event."""
+        result: list[tuple[Timespan, dict[str, Any]]] = []
+        for values in self.events:
+            start, end = (_parse(value) for value in values[ATTR_TIMESPAN])
+            if end <= now:
+                continue
+            result.append(
+                (
+                    Timespan.of(start, end),
+                    {
+                        **{name: values.get(name) for name in RESTORED_FIELDS},
+                        "start": _parse(values["start"]),
+                        "end": _parse(values["end"]),
+                    },
+                )
+            )
+        return result
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> RestoredEvents | None:
+        """Return the saved events, or None if the data is not valid."""
+        try:
+            restored = cls(list(data[ATTR_EVENTS]))
+            restored.occurrences(dt_util.now())
+        except (KeyError, TypeError, ValueError):
+            return None
+        return restored
+
+
+def _parse(value: str) -> datetime.date | datetime.datetime:
+    """Return the date or datetime from an ISO formatted string."""
+    if len(value) == 10:
+        return datetime.date.fromisoformat(value)
+    return datetime.datetime.fromisoformat(value)
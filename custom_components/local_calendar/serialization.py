@@ -0,0 +1,83 @@
+"""Render calendar components as ics content one event at a time.
+
+ical only encodes a whole calendar stream, so a single event is encoded by
+wrapping it in a calendar that is constructed without validation. Rendered
+events are cached so saving the calendar only renders the changed events.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from typing import Any
+
+from ical.calendar import Calendar
+from ical.calendar_stream import IcsCalendarStream
+from ical.event import Event
+
+from .store import join_calendar
+
+VEVENT = "vevent"
+
+
+def event_to_ics(event: Event) -> str:
+    """Return the VEVENT block for the event."""
+    stream = IcsCalendarStream.construct(calendars=[Calendar.construct(events=[event])])
+    model_data = json.loads(
+        stream.json(by_alias=True, exclude_none=True, exclude_defaults=True)
+    )
+    return Event.__encode_component__(
+        VEVENT, model_data["vcalendar"][0][VEVENT][0]
+    ).ics()
+
+
+def calendar_header(calendar: Calendar) -> str:
+    """Return the VCALENDAR content without any events."""
+    return IcsCalendarStream.calendar_to_ics(calendar.copy(update={"events": []}))
+
+
+class EventRenderCache:
+    """Cache of the rendered VEVENT block for each event on a calendar."""
+
+    def __init__(self) -> None:
+        """Initialize EventRenderCache."""
+        # Keyed by the event object, which is replaced when an event is
+        # reloaded. Events modified in place are invalidated by uid.
+        self._entries: dict[int, tuple[Event, str]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def invalidate(self, uids: Iterable[str]) -> None:
+        """Discard the rendered events with the specified uids."""
+        uids = set(uids)
+        self._entries = {
+            key: entry
+            for key, entry in self._entries.items()
+            if entry[0].uid not in uids
+        }
+
+    def render(self, calendar: Calendar) -> str:
+        """Return the ics content for the calendar, rendering only new events."""
+        entries: dict[int, tuple[Event, str]] = {}
+        for event in calendar.events:
+            entry = self._entries.get(id(event))
+            if entry is not None and entry[0] is event:
+                self._hits += 1
+            else:
+                self._misses += 1
+                entry = (event, event_to_ics(event))
+            entries[id(event)] = entry
+        self._entries = entries
+        return join_calendar(
+            calendar_header(calendar), (ics for _, ics in entries.values())
+        )
+
+    def report(self) -> dict[str, Any]:
+        """Return the cache size and hit ratio for diagnostics."""
+        lookups = self._hits + self._misses
+        return {
+            "events": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else None,
+        }
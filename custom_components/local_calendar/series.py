@@ -0,0 +1,264 @@
+"""Compaction of recurring event series.
+
+Editing or deleting instances of a recurring event leaves behind extra
+components: single instance overrides with a matching EXDATE on the series,
+and a new series forked off for every "this and future" change. These are
+kept even when the change is later reverted, and each one makes expanding
+the calendar timeline slower. Compaction folds them back into the original
+series when that does not change any occurrence.
+"""
+
+from __future__ import annotations
+
+import datetime
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from ical.calendar import Calendar
+from ical.event import Event
+from ical.timeline import calendar_timeline
+
+# Occurrences in this window are expanded to measure the expansion speedup
+BENCHMARK_WINDOW = datetime.timedelta(days=365)
+
+# Fields that may differ between events folded into the same series: when
+# each one occurs, and its identity and timestamps. Every other field, such
+# as alarms, status and categories, must match.
+SERIES_FIELDS = {
+    "uid",
+    "dtstamp",
+    "created",
+    "last_modified",
+    "sequence",
+    "dtstart",
+    "dtend",
+    "duration",
+    "rrule",
+    "rdate",
+    "exdate",
+    "recurrence_id",
+}
+
+
+@dataclass
+class SeriesCompaction:
+    """The result of compacting the recurring events on a calendar."""
+
+    overrides_folded: int = 0
+    """Single instance overrides folded back into their series."""
+
+    series_merged: int = 0
+    """Series forked off by a "this and future" change merged back."""
+
+    exdates_pruned: int = 0
+    """EXDATEs removed because they did not exclude an occurrence."""
+
+    expansion_seconds_before: float = 0.0
+    expansion_seconds_after: float = 0.0
+    uids: set[str] = field(default_factory=set)
+    """Events that were changed or removed."""
+
+    @property
+    def speedup(self) -> float:
+        """Return the ratio of expansion time before and after compaction."""
+        if not self.expansion_seconds_after:
+            return 1.0
+        return self.expansion_seconds_before / self.expansion_seconds_after
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary of the compaction for reporting."""
+        return {
+            "overrides_folded": self.overrides_folded,
+            "series_merged": self.series_merged,
+            "exdates_pruned": self.exdates_pruned,
+            "events_changed": len(self.uids),
+            "expansion_seconds_before": self.expansion_seconds_before,
+            "expansion_seconds_after": self.expansion_seconds_after,
+            "speedup": self.speedup,
+        }
+
+
+def compact_series(
+    calendar: Calendar, tzinfo: datetime.tzinfo, now: datetime.datetime
+) -> SeriesCompaction:
+    """Compact the recurring events on the calendar in place.
+
+    The timeline is expanded for a year from now before and after compaction
+    to measure the speedup. Recurrence rules may be shared between events so
+    they are replaced rather than modified.
+    """
+    result = SeriesCompaction()
+    result.expansion_seconds_before = _expansion_seconds(calendar, tzinfo, now)
+    events = list(calendar.events)
+    events = _merge_series(events, result)
+    events = _fold_overrides(events, result)
+    _prune_exdates(events, result)
+    # Update in place, assignment would validate and copy every event
+    calendar.events[:] = events
+    result.expansion_seconds_after = _expansion_seconds(calendar, tzinfo, now)
+    return result
+
+
+def _merge_series(events: list[Event], result: SeriesCompaction) -> list[Event]:
+    """Merge series that continue exactly where an earlier series ends."""
+    by_start: dict[datetime.datetime, list[Event]] = {}
+    for event in events:
+        if _is_series(event):
+            by_start.setdefault(_normalize(event.dtstart), []).append(event)
+
+    removed: set[int] = set()
+    for event in events:
+        if id(event) in removed or not _is_series(event):
+            continue
+        # Follow the chain of splits until no continuation is found
+        while (
+            event.rrule is not None
+            and (follower := _find_follower(event, by_start, removed)) is not None
+        ):
+            removed.add(id(follower))
+            event.rrule = event.rrule.copy(
+                update={"until": _last_until(follower), "count": None}
+            )
+            event.exdate[:] = [*event.exdate, *follower.exdate]
+            result.series_merged += 1
+            result.uids.update({event.uid, follower.uid})
+    return [event for event in events if id(event) not in removed]
+
+
+def _find_follower(
+    event: Event,
+    by_start: dict[datetime.datetime, list[Event]],
+    removed: set[int],
+) -> Event | None:
+    """Return a series that starts at the next occurrence after the event ends."""
+    if (
+        (rrule := event.rrule) is None
+        or (until := rrule.until) is None
+        or rrule.count is not None
+    ):
+        return None
+    unbounded = rrule.copy(update={"until": None, "count": None})
+    try:
+        next_start = unbounded.as_rrule(event.start).after(_normalize(until))
+    except TypeError:
+        # Floating and zoned times can't be compared
+        return None
+    if next_start is None:
+        return None
+    rule = rrule.dict(exclude={"until", "count"})
+    for follower in by_start.get(next_start, []):
+        if (
+            follower is not event
+            and id(follower) not in removed
+            and follower.rrule is not None
+            and follower.rrule.dict(exclude={"until", "count"}) == rule
+            and _same_content(event, follower)
+        ):
+            return follower
+    return None
+
+
+def _last_until(
+    event: Event,
+) -> datetime.datetime | datetime.date | None:
+    """Return the until value that covers every occurrence of the series."""
+    if (rrule := event.rrule) is None:
+        return None
+    if rrule.count is None:
+        return rrule.until
+    last: datetime.datetime = list(rrule.as_rrule(event.start))[-1]
+    if not isinstance(event.dtstart, datetime.datetime):
+        return last.date()
+    return last
+
+
+def _fold_overrides(events: list[Event], result: SeriesCompaction) -> list[Event]:
+    """Remove overrides identical to the series occurrence they replaced."""
+    exdates: dict[datetime.datetime, list[Event]] = {}
+    for event in events:
+        if _is_series(event):
+            for exdate in event.exdate:
+                exdates.setdefault(_normalize(exdate), []).append(event)
+
+    removed: set[int] = set()
+    for event in events:
+        if event.rrule or event.rdate or event.recurrence_id:
+            continue
+        start = _normalize(event.dtstart)
+        for series in exdates.get(start, []):
+            if not _same_content(event, series) or not _occurs_at(series, start):
+                continue
+            series.exdate[:] = [
+                exdate for exdate in series.exdate if _normalize(exdate) != start
+            ]
+            exdates[start].remove(series)
+            removed.add(id(event))
+            result.overrides_folded += 1
+            result.uids.update({event.uid, series.uid})
+            break
+    return [event for event in events if id(event) not in removed]
+
+
+def _prune_exdates(events: list[Event], result: SeriesCompaction) -> None:
+    """Remove EXDATEs that do not exclude any occurrence of the series."""
+    for event in events:
+        if not event.rrule or not event.exdate:
+            continue
+        rdates = {_normalize(rdate) for rdate in event.rdate}
+        kept = [
+            exdate
+            for exdate in event.exdate
+            if _normalize(exdate) in rdates or _occurs_at(event, _normalize(exdate))
+        ]
+        if len(kept) == len(event.exdate):
+            continue
+        result.exdates_pruned += len(event.exdate) - len(kept)
+        result.uids.add(event.uid)
+        event.exdate[:] = kept
+
+
+def _is_series(event: Event) -> bool:
+    """Return true if the event recurs only by its recurrence rule."""
+    return event.rrule is not None and not event.rdate
+
+
+def _same_content(event: Event, other: Event) -> bool:
+    """Return true if occurrences of the events are indistinguishable."""
+    return (
+        event.dict(exclude=SERIES_FIELDS) == other.dict(exclude=SERIES_FIELDS)
+        and type(event.dtstart) is type(other.dtstart)
+        and event.computed_duration == other.computed_duration
+    )
+
+
+def _occurs_at(event: Event, start: datetime.datetime) -> bool:
+    """Return true if the recurrence rule has an occurrence at the start time."""
+    if event.rrule is None:
+        return False
+    try:
+        return start in event.rrule.as_rrule(event.start)
+    except TypeError:
+        # Floating and zoned times can't be compared, keep the value
+        return True
+
+
+def _normalize(
+    value: datetime.datetime | datetime.date,
+) -> datetime.datetime:
+    """Convert a date to a datetime matching dateutil's logic."""
+    if not isinstance(value, datetime.datetime):
+        return datetime.datetime.fromordinal(value.toordinal())
+    return value
+
+
+def _expansion_seconds(
+    calendar: Calendar, tzinfo: datetime.tzinfo, now: datetime.datetime
+) -> float:
+    """Return the time to expand the timeline for the benchmark window."""
+    start = time.perf_counter()
+    for _ in calendar_timeline(calendar.events, tzinfo).overlapping(
+        now, now + BENCHMARK_WINDOW
+    ):
+        pass
+    return time.perf_counter() - start
@@ -0,0 +1,112 @@
+"""Occurrence statistics over a range of the calendar.
+
+Counts and total durations of occurrences are aggregated per day, week or
+month, optionally grouped by the summary or location of the event. The
+timeline is walked once and occurrences of recurring events are not copied,
+so no event objects are built for the individual occurrences.
+"""
+
+from __future__ import annotations
+
+import datetime
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from ical.event import Event
+from ical.timespan import Timespan
+
+from .const import PERIOD_MONTH, PERIOD_WEEK
+from .expansion import ExpansionLimits, timeline_items
+
+
+@dataclass
+class _Bucket:
+    """Aggregated occurrences for a period and group."""
+
+    count: int = 0
+    duration: datetime.timedelta = datetime.timedelta()
+
+
+@dataclass
+class Statistics:
+    """Occurrence statistics for a range of the calendar."""
+
+    period: str
+    group_by: str | None = None
+    buckets: dict[tuple[datetime.date, str | None], _Bucket] = field(
+        default_factory=dict
+    )
+    occurrences: int = 0
+    truncated: bool = False
+    """True if a limit was reached before the range was complete."""
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics sorted by period and group."""
+        return {
+            "period": self.period,
+            "group_by": self.group_by,
+            "occurrences": self.occurrences,
+            "truncated": self.truncated,
+            "buckets": [
+                {
+                    "start": start.isoformat(),
+                    **({"group": group} if self.group_by else {}),
+                    "count": bucket.count,
+                    "duration": bucket.duration.total_seconds(),
+                }
+                for (start, group), bucket in sorted(
+                    self.buckets.items(),
+                    key=lambda item: (item[0][0], item[0][1] or ""),
+                )
+            ],
+        }
+
+
+def compute_statistics(
+    events: list[Event],
+    tzinfo: datetime.tzinfo,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    period: str,
+    group_by: str | None,
+    limits: ExpansionLimits,
+) -> Statistics:
+    """Aggregate the occurrences overlapping the range, the end is exclusive.
+
+    An occurrence is counted in the period it starts in, or the first period
+    of the range if it started earlier, with its full duration.
+    """
+    result = Statistics(period=period, group_by=group_by)
+    timespan = Timespan.of(start, end)
+    deadline = time.monotonic() + limits.max_seconds
+    for item in timeline_items(events, tzinfo, copy_instances=False):
+        if time.monotonic() > deadline:
+            result.truncated = True
+            break
+        key = item.key
+        if not key.intersects(timespan):
+            if key > timespan:
+                break
+            continue
+        if result.occurrences >= limits.max_occurrences:
+            result.truncated = True
+            break
+        result.occurrences += 1
+        day = max(key.start, timespan.start).astimezone(tzinfo).date()
+        group = getattr(item.item, group_by) if group_by else None
+        bucket = result.buckets.setdefault(
+            (_period_start(day, period), group), _Bucket()
+        )
+        bucket.count += 1
+        bucket.duration += key.end - key.start
+    return result
+
+
+def _period_start(day: datetime.date, period: str) -> datetime.date:
+    """Return the first day of the period containing the day."""
+    if period == PERIOD_WEEK:
+        return day - datetime.timedelta(days=day.weekday())
+    if period == PERIOD_MONTH:
+        return day.replace(day=1)
+    return day
@@ -1,38 +1,342 @@
 """Local storage for the Local Calendar integration."""
 
+from __future__ import annotations
+
 import asyncio
+import bz2
+import gzip
+import hashlib
+import logging
+import lzma
+import os
+import tempfile
+import time
+import zlib
+from collections.abc import AsyncIterator, Callable, Coroutine, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from datetime import timedelta
 from pathlib import Path
+from typing import Any, NamedTuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import COMPRESSION_BZ2, COMPRESSION_GZIP, COMPRESSION_LZMA, COMPRESSION_NONE
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
 
-from homeassistant.core import HomeAssistant
+_LOGGER = logging.getLogger(__name__)
 
 STORAGE_PATH = ".storage/{key}.ics"
 
+# Interval for checking the file for changes when inotify is not available
+POLL_INTERVAL = timedelta(seconds=30)
+
+
+class _Codec(NamedTuple):
+    """A compression format of the calendar file."""
+
+    magic: bytes
+    """Prefix used to detect the format when the file is loaded."""
+
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+_CODECS: dict[str, _Codec] = {
+    COMPRESSION_GZIP: _Codec(b"\x1f\x8b", gzip.compress, gzip.decompress),
+    COMPRESSION_BZ2: _Codec(b"BZh", bz2.compress, bz2.decompress),
+    COMPRESSION_LZMA: _Codec(b"\xfd7zXZ\x00", lzma.compress, lzma.decompress),
+}
+
+
+@dataclass
+class StorageStats:
+    """Statistics about the calendar file storage."""
+
+    loads: int = 0
+    stores: int = 0
+    skipped_stores: int = 0
+    """Stores skipped since the file already had the same content."""
+
+    migrations: int = 0
+    content_bytes: int = 0
+    """Size of the calendar content from the last load or store."""
+
+    file_bytes: int = 0
+    """Size of the file from the last load or store."""
+
+    bytes_saved: int = 0
+    """Total bytes not written due to compression."""
+
+    load_seconds: float = 0.0
+    store_seconds: float = 0.0
+    compression_seconds: float = 0.0
+    """Time spent compressing or decompressing, included in the totals above."""
+
+    lock_acquisitions: int = 0
+    lock_wait_seconds: float = 0.0
+    lock_wait_max_seconds: float = 0.0
+    """Time spent waiting for other loads or stores to finish."""
+
 
 class LocalCalendarStore:
     """Local calendar storage."""
 
-    def __init__(self, hass: HomeAssistant, path: Path) -> None:
+    def __init__(
+        self, hass: HomeAssistant, path: Path, compression: str = COMPRESSION_NONE
+    ) -> None:
         """Initialize LocalCalendarStore."""
         self._hass = hass
         self._path = path
+        self._compression = compression
         self._lock = asyncio.Lock()
+        self._digest: bytes | None = None
+        self._signature: tuple[int, int] | None = None
+        self._stats = StorageStats()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return statistics about the storage for diagnostics."""
+        return {"compression": self._compression, **asdict(self._stats)}
+
+    @asynccontextmanager
+    async def _async_locked(self) -> AsyncIterator[None]:
+        """Hold the storage lock, recording the time spent waiting for it."""
+        start = time.perf_counter()
+        async with self._lock:
+            wait = time.perf_counter() - start
+            self._stats.lock_acquisitions += 1
+            self._stats.lock_wait_seconds += wait
+            self._stats.lock_wait_max_seconds = max(
+                self._stats.lock_wait_max_seconds, wait
+            )
+            yield
 
     async def async_load(self) -> str:
         """Load the calendar from disk."""
-        async with self._lock:
-            return await self._hass.async_add_executor_job(self._load)
+        async with self._async_locked():
+            content = await self._hass.async_add_executor_job(self._load_tracked)
+        return content
+
+    async def async_load_if_changed(self) -> str | None:
+        """Load the calendar from disk if changed since the last load or store."""
+        async with self._async_locked():
+            digest = self._digest
+            content = await self._hass.async_add_executor_job(self._load_tracked)
+        if self._digest == digest:
+            return None
+        return content
+
+    def _load_tracked(self) -> str:
+        """Load the calendar and remember the content that was seen."""
+        content = self._load()
+        self._digest = _digest(content)
+        self._signature = self._file_signature()
+        return content
 
     def _load(self) -> str:
-        """Load the calendar from disk."""
+        """Load the calendar from disk, decompressing if needed.
+
+        A file in a format other than the configured compression is rewritten
+        in the configured format.
+        """
         if not self._path.exists():
             return ""
-        return self._path.read_text()
+        start = time.perf_counter()
+        data = self._path.read_bytes()
+        compression = COMPRESSION_NONE
+        content_bytes = data
+        for name, codec in _CODECS.items():
+            if data.startswith(codec.magic):
+                compression = name
+                codec_start = time.perf_counter()
+                try:
+                    content_bytes = codec.decompress(data)
+                except (EOFError, ValueError, lzma.LZMAError, zlib.error) as err:
+                    raise OSError(f"Unable to decompress {self._path}: {err}") from err
+                self._stats.compression_seconds += time.perf_counter() - codec_start
+                break
+        content = content_bytes.decode()
+        self._stats.loads += 1
+        self._stats.load_seconds += time.perf_counter() - start
+        self._stats.content_bytes = len(content_bytes)
+        self._stats.file_bytes = len(data)
+        if compression != self._compression:
+            _LOGGER.debug(
+                "Migrating %s from %s to %s", self._path, compression, self._compression
+            )
+            self._stats.migrations += 1
+            self._store(content)
+        return content
 
     async def async_store(self, ics_content: str) -> None:
         """Persist the calendar to storage."""
-        async with self._lock:
-            await self._hass.async_add_executor_job(self._store, ics_content)
+        async with self._async_locked():
+            await self._hass.async_add_executor_job(self._store_tracked, ics_content)
+
+    def _store_tracked(self, ics_content: str) -> None:
+        """Persist the calendar and remember the content that was written.
+
+        The write is skipped when the content matches the last content loaded
+        or stored and the file has not been changed since.
+        """
+        digest = _digest(ics_content)
+        if digest == self._digest and self._signature == self._file_signature():
+            self._stats.skipped_stores += 1
+            return
+        self._store(ics_content)
+        self._digest = digest
+        self._signature = self._file_signature()
 
     def _store(self, ics_content: str) -> None:
-        """Persist the calendar to storage."""
-        self._path.write_text(ics_content)
+        """Persist the calendar to storage, compressing if configured."""
+        start = time.perf_counter()
+        content_bytes = ics_content.encode()
+        data = content_bytes
+        if codec := _CODECS.get(self._compression):
+            codec_start = time.perf_counter()
+            data = codec.compress(content_bytes)
+            self._stats.compression_seconds += time.perf_counter() - codec_start
+        _write_atomic(self._path, data)
+        self._stats.stores += 1
+        self._stats.store_seconds += time.perf_counter() - start
+        self._stats.content_bytes = len(content_bytes)
+        self._stats.file_bytes = len(data)
+        self._stats.bytes_saved += len(content_bytes) - len(data)
+
+    def _file_signature(self) -> tuple[int, int] | None:
+        """Return a cheap signature of the file used to detect changes."""
+        try:
+            stat = self._path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @callback
+    def async_watch(
+        self, on_change: Callable[[], Coroutine[Any, Any, None]]
+    ) -> CALLBACK_TYPE:
+        """Watch for changes to the file made outside of this store.
+
+        Uses inotify (via watchdog) when available, otherwise the file is polled.
+        Changes are detected by the file modification time and size, and the
+        callback is invoked on the event loop. The callback may still observe
+        content written by this store, see `async_load_if_changed`.
+        """
+
+        async def async_check(*_: Any) -> None:
+            signature = await self._hass.async_add_executor_job(self._file_signature)
+            if signature != self._signature:
+                _LOGGER.debug("Calendar file %s changed on disk", self._path)
+                self._signature = signature
+                await on_change()
+
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(
+                _FileEventHandler(self._hass, self._path, async_check),
+                str(self._path.parent),
+            )
+            observer.start()
+
+            @callback
+            def stop_observer() -> None:
+                observer.stop()
+                self._hass.async_add_executor_job(observer.join)
+
+            return stop_observer
+
+        return async_track_time_interval(self._hass, async_check, POLL_INTERVAL)
+
+
+class _FileEventHandler:
+    """Watchdog event handler that filters events for a single file."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: Path,
+        async_check: Callable[[], Coroutine[Any, Any, None]],
+    ) -> None:
+        """Initialize _FileEventHandler."""
+        self._hass = hass
+        self._path = str(path)
+        self._async_check = async_check
+
+    def dispatch(self, event: Any) -> None:
+        """Handle a file system event from the observer thread."""
+        paths = {event.src_path, getattr(event, "dest_path", None)}
+        if self._path in paths and not event.is_directory:
+            self._hass.add_job(self._async_check)
+
+
+def join_calendar(header: str, events: Iterable[str]) -> str:
+    """Return ics content for a calendar with the rendered VEVENT blocks.
+
+    The header is a VCALENDAR without events. Events are placed before any
+    other components such as timezones to match the output of ical.
+    """
+    index = header.find("\nBEGIN:")
+    if index < 0:
+        index = header.rindex("\nEND:VCALENDAR")
+    return "".join(
+        [header[:index], *(f"\n{event}" for event in events), header[index:]]
+    )
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write the file and rename it into place, so it is never left partial.
+
+    The data is flushed to disk before the rename, and the directory after,
+    so the file has either the old or the new content after a crash.
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as fdesc:
+        tmp_path = Path(fdesc.name)
+        try:
+            # Temporary files are created private, match a plain write
+            os.fchmod(fdesc.fileno(), 0o644)
+            fdesc.write(data)
+            fdesc.flush()
+            os.fsync(fdesc.fileno())
+        except OSError:
+            fdesc.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        # Directories can't be opened on some platforms
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        # or synced on some file systems, the rename is still atomic
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def read_calendar(path: Path) -> str:
+    """Return the calendar content of a file in any of the storage formats."""
+    data = path.read_bytes()
+    for codec in _CODECS.values():
+        if data.startswith(codec.magic):
+            return codec.decompress(data).decode()
+    return data.decode()
+
+
+def _digest(content: str) -> bytes:
+    """Return a digest of the calendar content."""
+    return hashlib.sha256(content.encode()).digest()
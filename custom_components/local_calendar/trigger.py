@@ -0,0 +1,288 @@
+"""Offer local calendar automation rules.
+
+All triggers attached to a calendar entity share a single scheduler. The
+scheduler keeps a heap of upcoming fire times for a bounded lookahead window
+and arms one timer for the earliest of them, so the cost of a trigger is an
+entry in the heap rather than a timer or a periodic refresh. When events on
+the calendar change, only the heap entries for the changed events are
+replaced. The scheduler outlives its entity when the config entry is
+reloaded, and is pointed at the new entity once it is added.
+"""
+from __future__ import annotations
+
+import datetime
+import heapq
+import itertools
+import logging
+from collections.abc import Coroutine
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+from homeassistant.const import CONF_ENTITY_ID, CONF_EVENT, CONF_OFFSET, CONF_PLATFORM
+from homeassistant.core import CALLBACK_TYPE, HassJob, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.trigger import TriggerActionType, TriggerInfo
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
+
+from . import _get_calendar_entity
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from .calendar import LocalCalendarEntity
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_START = "start"
+EVENT_END = "end"
+
+# Fire times are loaded into the heap for this much time ahead
+LOOKAHEAD = datetime.timedelta(hours=1)
+
+DATA_SCHEDULERS = f"{DOMAIN}_trigger_schedulers"
+
+TRIGGER_SCHEMA = cv.TRIGGER_BASE_SCHEMA.extend(
+    {
+        vol.Required(CONF_PLATFORM): DOMAIN,
+        vol.Required(CONF_ENTITY_ID): cv.entity_id,
+        vol.Optional(CONF_EVENT, default=EVENT_START): vol.In({EVENT_START, EVENT_END}),
+        vol.Optional(CONF_OFFSET, default=datetime.timedelta(0)): cv.time_period,
+    }
+)
+
+
+@dataclass
+class CalendarTrigger:
+    """An automation trigger attached to a calendar."""
+
+    job: HassJob[..., Coroutine[Any, Any, None]]
+    trigger_data: dict[str, Any]
+    event_type: str
+    offset: datetime.timedelta
+
+
+# Heap entries are (fire time, sequence, trigger id, LocalCalendarEvent). The
+# sequence breaks ties so that events are never compared.
+_HeapEntry = tuple[datetime.datetime, int, int, Any]
+
+
+class CalendarTriggerScheduler:
+    """Schedules all triggers for a calendar entity using a single timer."""
+
+    def __init__(self, hass: HomeAssistant, entity: LocalCalendarEntity | None) -> None:
+        """Initialize CalendarTriggerScheduler."""
+        self._hass = hass
+        self._entity = entity
+        self._triggers: dict[int, CalendarTrigger] = {}
+        self._trigger_ids = itertools.count()
+        self._sequence = itertools.count()
+        self._heap: list[_HeapEntry] = []
+        self._window_end = dt_util.utcnow()
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._unsub_listener: CALLBACK_TYPE | None = None
+
+    @property
+    def empty(self) -> bool:
+        """Return true if there are no triggers attached."""
+        return not self._triggers
+
+    @callback
+    def async_attach(self, trigger: CalendarTrigger) -> CALLBACK_TYPE:
+        """Attach a trigger to the scheduler."""
+        now = dt_util.utcnow()
+        if not self._triggers:
+            self._window_end = now + LOOKAHEAD
+            if self._entity is not None:
+                self._unsub_listener = self._entity.async_add_listener(
+                    self._handle_calendar_changed
+                )
+        trigger_id = next(self._trigger_ids)
+        self._triggers[trigger_id] = trigger
+        for entry in self._fetch({trigger_id}, now, self._window_end):
+            heapq.heappush(self._heap, entry)
+        self._schedule()
+
+        @callback
+        def detach() -> None:
+            self._async_detach(trigger_id)
+
+        return detach
+
+    @callback
+    def async_set_entity(self, entity: LocalCalendarEntity | None) -> None:
+        """Replace the entity the triggers fire for, or none while it is removed."""
+        if self._unsub_listener:
+            self._unsub_listener()
+            self._unsub_listener = None
+        self._entity = entity
+        self._heap = []
+        if not self._triggers:
+            return
+        if entity is not None:
+            self._unsub_listener = entity.async_add_listener(
+                self._handle_calendar_changed
+            )
+            self._heap = self._fetch(
+                set(self._triggers), dt_util.utcnow(), self._window_end
+            )
+            heapq.heapify(self._heap)
+        self._schedule()
+
+    @callback
+    def _async_detach(self, trigger_id: int) -> None:
+        """Remove the trigger and its pending fire times."""
+        self._triggers.pop(trigger_id, None)
+        self._heap = [entry for entry in self._heap if entry[2] != trigger_id]
+        heapq.heapify(self._heap)
+        if self._triggers:
+            self._schedule()
+            return
+        self._clear_timer()
+        if self._unsub_listener:
+            self._unsub_listener()
+            self._unsub_listener = None
+
+    def _fetch(
+        self,
+        trigger_ids: set[int],
+        start: datetime.datetime,
+        end: datetime.datetime,
+        uids: set[str] | None = None,
+    ) -> list[_HeapEntry]:
+        """Return heap entries for triggers that fire in the range (start, end].
+
+        The calendar is expanded once for each distinct event type and offset
+        rather than once per trigger.
+        """
+        if self._entity is None:
+            return []
+        groups: dict[tuple[str, datetime.timedelta], list[int]] = {}
+        for trigger_id in trigger_ids:
+            trigger = self._triggers[trigger_id]
+            groups.setdefault((trigger.event_type, trigger.offset), []).append(
+                trigger_id
+            )
+        entries: list[_HeapEntry] = []
+        for (event_type, offset), group_ids in groups.items():
+            # Event time ranges are exclusive so the end time is expanded by 1sec
+            occurrences = self._entity.async_occurrences(
+                start - offset, end - offset + datetime.timedelta(seconds=1), uids
+            )
+            for timespan, event in occurrences:
+                fire_time = (
+                    timespan.start if event_type == EVENT_START else timespan.end
+                ) + offset
+                if not start < fire_time <= end:
+                    continue
+                for trigger_id in group_ids:
+                    entries.append((fire_time, next(self._sequence), trigger_id, event))
+        return entries
+
+    @callback
+    def _schedule(self) -> None:
+        """Arm the timer for the next fire time or the end of the window."""
+        self._clear_timer()
+        next_time = self._window_end
+        if self._heap and self._heap[0][0] < next_time:
+            next_time = self._heap[0][0]
+        self._unsub_timer = async_track_point_in_utc_time(
+            self._hass, self._handle_timer, next_time
+        )
+
+    def _clear_timer(self) -> None:
+        """Cancel the armed timer."""
+        if self._unsub_timer:
+            self._unsub_timer()
+        self._unsub_timer = None
+
+    @callback
+    def _handle_timer(self, now: datetime.datetime) -> None:
+        """Fire all due triggers and advance the window if it has passed."""
+        self._unsub_timer = None
+        while self._heap and self._heap[0][0] <= now:
+            (_, _, trigger_id, event) = heapq.heappop(self._heap)
+            trigger = self._triggers[trigger_id]
+            _LOGGER.debug("Firing trigger for event: %s", event)
+            self._hass.async_run_hass_job(
+                trigger.job,
+                {
+                    "trigger": {
+                        **trigger.trigger_data,
+                        "calendar_event": event.as_dict(),
+                    }
+                },
+            )
+        if now >= self._window_end:
+            window_start = self._window_end
+            self._window_end = now + LOOKAHEAD
+            for entry in self._fetch(
+                set(self._triggers), window_start, self._window_end
+            ):
+                heapq.heappush(self._heap, entry)
+        self._schedule()
+
+    @callback
+    def _handle_calendar_changed(self, uids: set[str]) -> None:
+        """Replace the pending fire times for events that changed."""
+        now = dt_util.utcnow()
+        self._heap = [entry for entry in self._heap if entry[3].uid not in uids]
+        self._heap.extend(self._fetch(set(self._triggers), now, self._window_end, uids))
+        heapq.heapify(self._heap)
+        self._schedule()
+
+
+async def async_attach_trigger(
+    hass: HomeAssistant,
+    config: ConfigType,
+    action: TriggerActionType,
+    trigger_info: TriggerInfo,
+) -> CALLBACK_TYPE:
+    """Attach trigger for the specified local calendar."""
+    entity_id = config[CONF_ENTITY_ID]
+    event_type = config[CONF_EVENT]
+    offset = config[CONF_OFFSET]
+
+    try:
+        entity = _get_calendar_entity(hass, entity_id)
+    except HomeAssistantError as err:
+        raise HomeAssistantError(
+            f"Entity does not exist {entity_id} or is not a local calendar entity"
+        ) from err
+
+    schedulers: dict[str, CalendarTriggerScheduler] = hass.data.setdefault(
+        DATA_SCHEDULERS, {}
+    )
+    if entity_id not in schedulers:
+        schedulers[entity_id] = CalendarTriggerScheduler(hass, entity)
+    scheduler = schedulers[entity_id]
+
+    trigger_data = {
+        **trigger_info["trigger_data"],
+        "platform": DOMAIN,
+        "event": event_type,
+        "offset": offset,
+    }
+    detach = scheduler.async_attach(
+        CalendarTrigger(HassJob(action), trigger_data, event_type, offset)
+    )
+
+    @callback
+    def async_detach() -> None:
+        detach()
+        if scheduler.empty:
+            schedulers.pop(entity_id, None)
+
+    return async_detach
+
+
+@callback
+def async_set_calendar_entity(
+    hass: HomeAssistant, entity_id: str, entity: LocalCalendarEntity | None
+) -> None:
+    """Point the triggers for a calendar at its entity, or none when removed."""
+    schedulers: dict[str, CalendarTriggerScheduler] = hass.data.get(DATA_SCHEDULERS, {})
+    if (scheduler := schedulers.get(entity_id)) is not None:
+        scheduler.async_set_entity(entity)
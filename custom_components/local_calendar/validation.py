@@ -0,0 +1,35 @@
+"""Construct events from input that was already validated by a schema.
+
+Service and websocket input is validated by voluptuous before it reaches the
+calendar, so parsing it again as a pydantic model repeats the type
+validation of every field. Events are instead constructed directly and only
+checked by the event's root validators, which verify the fields are
+consistent with each other.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from ical.event import Event
+from ical.types import Recur
+
+EVENT_RRULE = "rrule"
+
+
+def construct_event(values: dict[str, Any]) -> Event:
+    """Return an event for values with the types expected by the model.
+
+    Fields that are not specified are unset, so the event can also be used as
+    a partial update. A recurrence rule may be specified as a string, and
+    an empty rule is ignored.
+    """
+    values = dict(values)
+    if isinstance(rrule := values.get(EVENT_RRULE), str):
+        if rrule:
+            values[EVENT_RRULE] = Recur.from_rrule(rrule)
+        else:
+            del values[EVENT_RRULE]
+    for _, validator in Event.__post_root_validators__:
+        values = validator(Event, values)
+    return Event.construct(**values)
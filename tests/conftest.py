@@ -1,8 +1,222 @@
 """Fixtures for tests."""
 
-from collections.abc import Generator
+import urllib
+import zoneinfo
+from collections.abc import Awaitable, Callable, Generator
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
 
 import pytest
+from aiohttp import ClientSession, ClientWebSocketResponse
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.local_calendar import LocalCalendarStore
+from custom_components.local_calendar.const import CONF_CALENDAR_NAME, DOMAIN
+
+CALENDAR_NAME = "Light Schedule"
+FRIENDLY_NAME = "Light schedule"
+TEST_ENTITY = "calendar.light_schedule"
+
+
+class FakeStore(LocalCalendarStore):
+    """Mock storage implementation."""
+
+    def __init__(self, hass: HomeAssistant, path: Path, **kwargs: Any) -> None:
+        """Initialize FakeStore."""
+        super().__init__(hass, path, **kwargs)
+        self._content = ""
+
+    def _load(self) -> str:
+        """Read from calendar storage."""
+        return self._content
+
+    def _store(self, ics_content: str) -> None:
+        """Persist the calendar storage."""
+        self._content = ics_content
+
+    def _file_signature(self) -> tuple[int, int]:
+        """Return a signature of the fake file contents."""
+        return (hash(self._content), len(self._content))
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add an option to run the benchmarks."""
+    parser.addoption("--benchmark", action="store_true", help="Run benchmarks")
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Register the benchmark marker."""
+    config.addinivalue_line("markers", "benchmark: timing report, not a test")
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    """Skip the benchmarks unless requested, timings are not reliable in CI."""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="Run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(name="store", autouse=True)
+def mock_store() -> None:
+    """Test cleanup, remove any media storage persisted during the test."""
+
+    def new_store(hass: HomeAssistant, path: Path, **kwargs: Any) -> FakeStore:
+        return FakeStore(hass, path, **kwargs)
+
+    # The fake store has no file on disk to watch, so it is always polled
+    with patch(
+        "custom_components.local_calendar.LocalCalendarStore", new=new_store
+    ), patch("custom_components.local_calendar.store.Observer", new=None):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def set_time_zone(hass: HomeAssistant):
+    """Set the time zone for the tests."""
+    # Set our timezone to CST/Regina so we can check calculations
+    # This keeps UTC-6 all year round
+    hass.config.set_time_zone("America/Regina")
+    with patch(
+        "ical.util.local_timezone", return_value=zoneinfo.ZoneInfo("America/Regina")
+    ):
+        yield
+
+
+@pytest.fixture(name="options")
+def mock_options() -> dict[str, Any]:
+    """Fixture for config entry options, may be overridden by parametrize."""
+    return {}
+
+
+@pytest.fixture(name="config_entry")
+def mock_config_entry(options: dict[str, Any]) -> MockConfigEntry:
+    """Fixture for mock configuration entry."""
+    return MockConfigEntry(
+        domain=DOMAIN, data={CONF_CALENDAR_NAME: CALENDAR_NAME}, options=options
+    )
+
+
+@pytest.fixture(name="_setup_integration")
+async def setup_integration(
+    hass: HomeAssistant, config_entry: MockConfigEntry, enable_custom_integrations
+) -> None:
+    """Set up the integration."""
+    _ = enable_custom_integrations
+    config_entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+
+@pytest.fixture(name="create_event")
+def create_event_fixture(
+    hass: HomeAssistant,
+) -> Callable[[dict[str, Any]], Awaitable[None]]:
+    """Fixture to simplify creating events for tests."""
+
+    async def _create(data: dict[str, Any]) -> None:
+        await hass.services.async_call(
+            DOMAIN,
+            "create_event",
+            data,
+            target={"entity_id": TEST_ENTITY},
+            blocking=True,
+        )
+
+    return _create
+
+
+@pytest.fixture(name="delete_event")
+def delete_event_fixture(
+    hass: HomeAssistant,
+) -> Callable[[dict[str, Any]], Awaitable[None]]:
+    """Fixture to simplify deleting events for tests."""
+
+    async def _delete(data: dict[str, Any]) -> None:
+        await hass.services.async_call(
+            DOMAIN,
+            "delete_event",
+            data,
+            target={"entity_id": TEST_ENTITY},
+            blocking=True,
+        )
+
+    return _delete
+
+
+GetEventsFn = Callable[[str, str], Awaitable[dict[str, Any]]]
+
+
+@pytest.fixture(name="get_events")
+def get_events_fixture(
+    hass_client: Callable[..., Awaitable[ClientSession]]
+) -> GetEventsFn:
+    """Fetch calendar events from the HTTP API."""
+
+    async def _fetch(start: str, end: str) -> None:
+        client = await hass_client()
+        response = await client.get(
+            f"/api/calendars/{TEST_ENTITY}?start={urllib.parse.quote(start)}"
+            f"&end={urllib.parse.quote(end)}"
+        )
+        assert response.status == HTTPStatus.OK
+        return await response.json()
+
+    return _fetch
+
+
+class Client:
+    """Test client with helper methods for calendar websocket."""
+
+    def __init__(self, client):
+        """Initialize Client."""
+        self.client = client
+        self._id = 0
+
+    async def cmd(self, cmd: str, payload: dict[str, Any] = None) -> dict[str, Any]:
+        """Send a command and receive the json result."""
+        self._id += 1
+        await self.client.send_json(
+            {
+                "id": self._id,
+                "type": f"calendar/event/{cmd}",
+                **(payload if payload is not None else {}),
+            }
+        )
+        resp = await self.client.receive_json()
+        assert resp.get("id") == self._id
+        return resp
+
+    async def cmd_result(self, cmd: str, payload: dict[str, Any] = None) -> Any:
+        """Send a command and parse the result."""
+        resp = await self.cmd(cmd, payload)
+        assert resp.get("success")
+        assert resp.get("type") == "result"
+        return resp.get("result")
+
+
+ClientFixture = Callable[[], Client]
+
+
+@pytest.fixture(name="ws_client")
+async def mock_ws_client(
+    hass_ws_client: Callable[[...], ClientWebSocketResponse]
+) -> ClientFixture:
+    """Fixture for creating the test websocket client."""
+
+    async def create_client() -> Client:
+        ws_client = await hass_ws_client()
+        return Client(ws_client)
+
+    return create_client
 
 
 @pytest.fixture(autouse=True)
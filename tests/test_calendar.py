@@ -1,143 +1,46 @@
 """Tests for calendar platform of local calendar."""
 
+import asyncio
 import datetime
-import urllib
-import zoneinfo
+import pstats
+import threading
 from collections.abc import Awaitable, Callable
-from http import HTTPStatus
 from pathlib import Path
 from typing import Any
 from unittest.mock import patch
 
 import homeassistant.util.dt as dt_util
 import pytest
-from aiohttp import ClientSession, ClientWebSocketResponse
-from homeassistant.const import STATE_OFF, STATE_ON
-from homeassistant.core import HomeAssistant
+from homeassistant.const import STATE_OFF, STATE_ON, STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant, State
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.template import DATE_STR_FORMAT
 from homeassistant.setup import async_setup_component
-from pytest_homeassistant_custom_component.common import MockConfigEntry
-
-from custom_components.local_calendar import LocalCalendarStore
-from custom_components.local_calendar.const import CONF_CALENDAR_NAME, DOMAIN
-
-CALENDAR_NAME = "Light Schedule"
-FRIENDLY_NAME = "Light schedule"
-TEST_ENTITY = "calendar.light_schedule"
-
-
-class FakeStore(LocalCalendarStore):
-    """Mock storage implementation."""
-
-    def __init__(self, hass: HomeAssistant, path: Path) -> None:
-        """Initialize FakeStore."""
-        super().__init__(hass, path)
-        self._content = ""
-
-    def _load(self) -> str:
-        """Read from calendar storage."""
-        return self._content
-
-    def _store(self, ics_content: str) -> None:
-        """Persist the calendar storage."""
-        self._content = ics_content
-
-
-@pytest.fixture(name="store", autouse=True)
-def mock_store() -> None:
-    """Test cleanup, remove any media storage persisted during the test."""
-
-    def new_store(hass: HomeAssistant, path: Path) -> FakeStore:
-        return FakeStore(hass, path)
-
-    with patch("custom_components.local_calendar.LocalCalendarStore", new=new_store):
-        yield
-
-
-@pytest.fixture(autouse=True)
-def set_time_zone(hass: HomeAssistant):
-    """Set the time zone for the tests."""
-    # Set our timezone to CST/Regina so we can check calculations
-    # This keeps UTC-6 all year round
-    hass.config.set_time_zone("America/Regina")
-    with patch(
-        "ical.util.local_timezone", return_value=zoneinfo.ZoneInfo("America/Regina")
-    ):
-        yield
-
-
-@pytest.fixture(name="config_entry")
-def mock_config_entry() -> MockConfigEntry:
-    """Fixture for mock configuration entry."""
-    return MockConfigEntry(domain=DOMAIN, data={CONF_CALENDAR_NAME: CALENDAR_NAME})
-
-
-@pytest.fixture(name="_setup_integration")
-async def setup_integration(
-    hass: HomeAssistant, config_entry: MockConfigEntry, enable_custom_integrations
-) -> None:
-    """Set up the integration."""
-    _ = enable_custom_integrations
-    config_entry.add_to_hass(hass)
-    assert await async_setup_component(hass, DOMAIN, {})
-    await hass.async_block_till_done()
-
-
-@pytest.fixture(name="create_event")
-def create_event_fixture(
-    hass: HomeAssistant,
-) -> Callable[[dict[str, Any]], Awaitable[None]]:
-    """Fixture to simplify creating events for tests."""
-
-    async def _create(data: dict[str, Any]) -> None:
-        await hass.services.async_call(
-            DOMAIN,
-            "create_event",
-            data,
-            target={"entity_id": TEST_ENTITY},
-            blocking=True,
-        )
-
-    return _create
-
-
-@pytest.fixture(name="delete_event")
-def delete_event_fixture(
-    hass: HomeAssistant,
-) -> Callable[[dict[str, Any]], Awaitable[None]]:
-    """Fixture to simplify deleting events for tests."""
-
-    async def _delete(data: dict[str, Any]) -> None:
-        await hass.services.async_call(
-            DOMAIN,
-            "delete_event",
-            data,
-            target={"entity_id": TEST_ENTITY},
-            blocking=True,
-        )
-
-    return _delete
-
-
-GetEventsFn = Callable[[str, str], Awaitable[dict[str, Any]]]
-
-
-@pytest.fixture(name="get_events")
-def get_events_fixture(
-    hass_client: Callable[..., Awaitable[ClientSession]]
-) -> GetEventsFn:
-    """Fetch calendar events from the HTTP API."""
-
-    async def _fetch(start: str, end: str) -> None:
-        client = await hass_client()
-        response = await client.get(
-            f"/api/calendars/{TEST_ENTITY}?start={urllib.parse.quote(start)}"
-            f"&end={urllib.parse.quote(end)}"
-        )
-        assert response.status == HTTPStatus.OK
-        return await response.json()
-
-    return _fetch
+from ical.calendar import Calendar
+from ical.calendar_stream import IcsCalendarStream
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+    mock_restore_cache_with_extra_data,
+)
+
+from custom_components.local_calendar.calendar import LocalCalendarEntity
+from custom_components.local_calendar.const import (
+    CONF_CALENDAR_NAME,
+    CONF_MAX_EXPANSION_TIME,
+    CONF_MAX_OCCURRENCES,
+    CONF_PARALLEL_EXPANSION_THRESHOLD,
+    CONF_QUERY_CHUNK_SIZE,
+    DOMAIN,
+)
+from custom_components.local_calendar.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from custom_components.local_calendar.profiler import CalendarProfiler
+from custom_components.local_calendar.series import compact_series
+from custom_components.local_calendar.store import POLL_INTERVAL
+
+from .conftest import FRIENDLY_NAME, TEST_ENTITY, ClientFixture, FakeStore, GetEventsFn
 
 
 def event_fields(data: dict[str, str]) -> dict[str, str]:
@@ -241,7 +144,10 @@ async def test_active_event(hass, _setup_integration, create_event):
     state = hass.states.get(TEST_ENTITY)
     assert state.name == FRIENDLY_NAME
     assert state.state == STATE_ON
-    assert dict(state.attributes) == {
+    attributes = dict(state.attributes)
+    upcoming = attributes.pop("upcoming_events")
+    assert [event["summary"] for event in upcoming] == ["Evening lights"]
+    assert attributes == {
         "friendly_name": FRIENDLY_NAME,
         "message": "Evening lights",
         "all_day": False,
@@ -267,7 +173,10 @@ async def test_upcoming_event(hass, _setup_integration, create_event):
     state = hass.states.get(TEST_ENTITY)
     assert state.name == FRIENDLY_NAME
     assert state.state == STATE_OFF
-    assert dict(state.attributes) == {
+    attributes = dict(state.attributes)
+    upcoming = attributes.pop("upcoming_events")
+    assert [event["summary"] for event in upcoming] == ["Evening lights"]
+    assert attributes == {
         "friendly_name": FRIENDLY_NAME,
         "message": "Evening lights",
         "all_day": False,
@@ -278,6 +187,45 @@ async def test_upcoming_event(hass, _setup_integration, create_event):
     }
 
 
+async def test_upcoming_events_attribute(
+    hass, _setup_integration, create_event, delete_event
+):
+    """Test the bounded list of upcoming events is kept up to date."""
+    start = dt_util.now() + datetime.timedelta(days=1)
+    await create_event(
+        {
+            "summary": "Daily walk",
+            "dtstart": start,
+            "dtend": start + datetime.timedelta(hours=1),
+            "rrule": "FREQ=DAILY",
+        }
+    )
+    await create_event(
+        {
+            "summary": "Dentist",
+            "dtstart": start + datetime.timedelta(days=2, hours=2),
+            "dtend": start + datetime.timedelta(days=2, hours=3),
+        }
+    )
+
+    state = hass.states.get(TEST_ENTITY)
+    upcoming = state.attributes["upcoming_events"]
+    assert [event["summary"] for event in upcoming] == [
+        "Daily walk",
+        "Daily walk",
+        "Daily walk",
+        "Dentist",
+        "Daily walk",
+    ]
+
+    # Removing the recurring event refills the list from the calendar
+    await delete_event({"uid": upcoming[0]["uid"]})
+    state = hass.states.get(TEST_ENTITY)
+    upcoming = state.attributes["upcoming_events"]
+    assert [event["summary"] for event in upcoming] == ["Dentist"]
+    assert state.attributes["message"] == "Dentist"
+
+
 async def test_recurring_event(_setup_integration, create_event, get_events):
     """Test an event with a recurrence rule."""
     await create_event(
@@ -314,52 +262,6 @@ async def test_recurring_event(_setup_integration, create_event, get_events):
     ]
 
 
-class Client:
-    """Test client with helper methods for calendar websocket."""
-
-    def __init__(self, client):
-        """Initialize Client."""
-        self.client = client
-        self._id = 0
-
-    async def cmd(self, cmd: str, payload: dict[str, Any] = None) -> dict[str, Any]:
-        """Send a command and receive the json result."""
-        self._id += 1
-        await self.client.send_json(
-            {
-                "id": self._id,
-                "type": f"calendar/event/{cmd}",
-                **(payload if payload is not None else {}),
-            }
-        )
-        resp = await self.client.receive_json()
-        assert resp.get("id") == self._id
-        return resp
-
-    async def cmd_result(self, cmd: str, payload: dict[str, Any] = None) -> Any:
-        """Send a command and parse the result."""
-        resp = await self.cmd(cmd, payload)
-        assert resp.get("success")
-        assert resp.get("type") == "result"
-        return resp.get("result")
-
-
-ClientFixture = Callable[[], Client]
-
-
-@pytest.fixture(name="ws_client")
-async def mock_ws_client(
-    hass_ws_client: Callable[[...], ClientWebSocketResponse]
-) -> ClientFixture:
-    """Fixture for creating the test websocket client."""
-
-    async def create_client() -> Client:
-        ws_client = await hass_ws_client()
-        return Client(ws_client)
-
-    return create_client
-
-
 async def test_websocket_create(
     ws_client: ClientFixture, _setup_integration: None, get_events: GetEventsFn
 ):
@@ -689,3 +591,1074 @@ async def test_delete_event_recurring(
             "end": {"dateTime": "2022-08-22T09:00:00-06:00"},
         },
     ]
+
+
+async def test_reload_changed_file(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+):
+    """Test that changes to the file made by another program are loaded."""
+    start = dt_util.now() + datetime.timedelta(days=1)
+    await create_event(
+        {
+            "summary": "Evening lights",
+            "dtstart": start,
+            "dtend": start + datetime.timedelta(hours=1),
+        }
+    )
+    changes: list[set[str]] = []
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+    entity.async_add_listener(changes.append)
+
+    # Simulate a sync tool replacing the file contents
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    store._content = store._content.replace("Evening lights", "Morning lights")
+    async_fire_time_changed(hass, dt_util.utcnow() + POLL_INTERVAL)
+    await hass.async_block_till_done()
+
+    state = hass.states.get(TEST_ENTITY)
+    assert state.attributes["message"] == "Morning lights"
+    assert changes == [{state.attributes["upcoming_events"][0]["uid"]}]
+
+    # The store writing its own content is not treated as a change
+    async_fire_time_changed(hass, dt_util.utcnow() + 2 * POLL_INTERVAL)
+    await hass.async_block_till_done()
+    assert len(changes) == 1
+
+    # Content formatted differently by the other program is not written back
+    content = store._content.replace("Morning lights", "Porch lights").replace(
+        "\n", "\r\n"
+    )
+    store._content = content
+    async_fire_time_changed(hass, dt_util.utcnow() + 3 * POLL_INTERVAL)
+    await hass.async_block_till_done()
+    assert hass.states.get(TEST_ENTITY).attributes["message"] == "Porch lights"
+    assert len(changes) == 2
+    assert store._content == content
+
+
+async def test_reload_while_changing(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+):
+    """Test events changed while a reloaded file is parsed are kept."""
+    start = dt_util.now() + datetime.timedelta(days=1)
+    await create_event(
+        {
+            "summary": "A",
+            "dtstart": start,
+            "dtend": start + datetime.timedelta(hours=1),
+        }
+    )
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    store._content = store._content.replace("SUMMARY:A", "SUMMARY:A2")
+
+    # Hold the reload while the file is parsed
+    parsing = threading.Event()
+    resume = threading.Event()
+    calendar_from_ics = IcsCalendarStream.calendar_from_ics
+
+    def paused_calendar_from_ics(content: str) -> Calendar:
+        parsing.set()
+        resume.wait(timeout=10)
+        return calendar_from_ics(content)
+
+    with patch.object(IcsCalendarStream, "calendar_from_ics", paused_calendar_from_ics):
+        async_fire_time_changed(hass, dt_util.utcnow() + POLL_INTERVAL)
+        while not parsing.is_set():
+            await asyncio.sleep(0.01)
+        await create_event(
+            {
+                "summary": "B",
+                "dtstart": start + datetime.timedelta(hours=2),
+                "dtend": start + datetime.timedelta(hours=3),
+            }
+        )
+        resume.set()
+        await hass.async_block_till_done()
+
+    events = await get_events(
+        start.isoformat(), (start + datetime.timedelta(days=1)).isoformat()
+    )
+    assert [event["summary"] for event in events] == ["A2", "B"]
+    # The file has both the reloaded and the created event
+    assert "SUMMARY:A2" in store._content
+    assert "SUMMARY:B" in store._content
+
+
+async def test_reload_partial_file(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+):
+    """Test a file that is partly written by another program is not applied."""
+    start = dt_util.now() + datetime.timedelta(days=1)
+    for summary in ("A", "B", "C"):
+        await create_event(
+            {
+                "summary": summary,
+                "dtstart": start,
+                "dtend": start + datetime.timedelta(hours=1),
+            }
+        )
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    content = store._content
+
+    async def reload(partial: str, count: int) -> list[str]:
+        store._content = partial
+        async_fire_time_changed(hass, dt_util.utcnow() + count * POLL_INTERVAL)
+        await hass.async_block_till_done()
+        events = await get_events(
+            start.isoformat(), (start + datetime.timedelta(days=1)).isoformat()
+        )
+        return [event["summary"] for event in events]
+
+    # Cut off part way through an event, an empty file and content that
+    # can't be parsed
+    for count, partial in enumerate(
+        (content[: len(content) // 2], "", content[: content.index("END:VEVENT")]),
+        start=1,
+    ):
+        assert await reload(partial, count) == ["A", "B", "C"]
+        assert store._content == partial
+
+    # The complete file is applied when the program finishes writing it
+    assert await reload(content.replace("SUMMARY:B", "SUMMARY:B2"), 4) == [
+        "A",
+        "B2",
+        "C",
+    ]
+
+
+async def test_diagnostics(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+    get_events: GetEventsFn,
+):
+    """Test diagnostics and sharing of values between events."""
+    client = await ws_client()
+    uids = []
+    for dtstart in ("2022-08-22T08:30:00", "2022-08-22T18:30:00"):
+        result = await client.cmd_result(
+            "create",
+            {
+                "entity_id": TEST_ENTITY,
+                "event": {
+                    "summary": "Feed the cat",
+                    "dtstart": dtstart,
+                    "dtend": dtstart.replace(":30:", ":45:"),
+                    "rrule": "FREQ=DAILY",
+                },
+            },
+        )
+        uids.append(result["uid"])
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["storage"]["compression"] == "none"
+    memory = data["entities"][TEST_ENTITY]["memory"]
+    assert memory["events"] == 2
+    assert memory["recurring_events"] == 2
+    assert memory["distinct_rrules"] == 1
+    assert memory["values_shared"] > 0
+    assert memory["estimated_bytes"] > 0
+    # The first event is rendered once and reused when the second is saved
+    assert data["entities"][TEST_ENTITY]["render_cache"] == {
+        "events": 2,
+        "hits": 1,
+        "misses": 2,
+        "hit_ratio": 1 / 3,
+    }
+
+    # Modifying one series does not change the shared rule of the other
+    await client.cmd_result(
+        "delete",
+        {
+            "entity_id": TEST_ENTITY,
+            "uid": uids[0],
+            "recurrence_id": "20220823T083000",
+            "recurrence_range": "THISANDFUTURE",
+        },
+    )
+    events = await get_events("2022-08-23T00:00:00", "2022-08-24T00:00:00")
+    assert list(map(event_fields, events)) == [
+        {
+            "summary": "Feed the cat",
+            "start": {"dateTime": "2022-08-23T18:30:00-06:00"},
+            "end": {"dateTime": "2022-08-23T18:45:00-06:00"},
+        }
+    ]
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["memory"]["distinct_rrules"] == 2
+    render_cache = data["entities"][TEST_ENTITY]["render_cache"]
+    assert render_cache["hits"] == 2
+    assert render_cache["misses"] == 3
+
+
+async def test_profile_service(
+    hass: HomeAssistant,
+    tmp_path: Path,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+):
+    """Test capturing a profile of a fixed number of operations."""
+    hass.config.config_dir = str(tmp_path)
+    await hass.services.async_call(
+        DOMAIN,
+        "profile",
+        {"operations": 3},
+        target={"entity_id": TEST_ENTITY},
+        blocking=True,
+    )
+    # Creating an event profiles the change and the save, then the query
+    await create_event(
+        {
+            "summary": "Bastille Day Party",
+            "dtstart": "1997-07-14T17:00:00+00:00",
+            "dtend": "1997-07-15T04:00:00+00:00",
+        }
+    )
+    assert not list(tmp_path.glob("*.pstats"))
+    await get_events("1997-07-14T00:00:00", "1997-07-16T00:00:00")
+    await hass.async_block_till_done()
+
+    paths = list(tmp_path.glob("local_calendar.calendar_light_schedule.*.pstats"))
+    assert len(paths) == 1
+    stats = pstats.Stats(str(paths[0]))
+    assert any(func[2] == "calendar_to_ics" for func in stats.stats)
+
+
+async def test_profile_operation_spans_profiles(
+    hass: HomeAssistant, tmp_path: Path
+) -> None:
+    """Test an operation running when a profile ends is not counted in the next."""
+    profiler = CalendarProfiler(hass)
+    profiler.async_start(
+        str(tmp_path / "first.pstats"), datetime.timedelta(minutes=1), operations=2
+    )
+    with profiler.profile():
+        # The first profile ends by its duration and another is started
+        async_fire_time_changed(hass, dt_util.utcnow() + datetime.timedelta(minutes=2))
+        profiler.async_start(
+            str(tmp_path / "second.pstats"),
+            datetime.timedelta(minutes=10),
+            operations=1,
+        )
+    await hass.async_block_till_done()
+    assert [path.name for path in tmp_path.iterdir()] == ["first.pstats"]
+
+    with profiler.profile():
+        pass
+    await hass.async_block_till_done()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "first.pstats",
+        "second.pstats",
+    ]
+
+
+async def test_compact_series_service(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+    get_events: GetEventsFn,
+):
+    """Test folding overrides and split series back into a recurring series."""
+    client = await ws_client()
+    result = await client.cmd_result(
+        "create",
+        {
+            "entity_id": TEST_ENTITY,
+            "event": {
+                "summary": "Feed the cat",
+                "dtstart": "2022-08-22T08:30:00",
+                "dtend": "2022-08-22T08:45:00",
+                "rrule": "FREQ=DAILY",
+            },
+        },
+    )
+    uid = result["uid"]
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+    # Split the series and override an instance without changing anything
+    await entity.async_update_event(
+        uid=uid,
+        recurrence_id="20220825T083000",
+        recurrence_range="THIS_AND_FUTURE",
+        summary="Feed the cat",
+    )
+    await entity.async_update_event(
+        uid=uid,
+        recurrence_id="20220823T083000",
+        summary="Feed the cat",
+        dtstart=datetime.datetime(2022, 8, 23, 8, 30),
+        dtend=datetime.datetime(2022, 8, 23, 8, 45),
+    )
+    # Delete an instance, and an instance that is not part of the series
+    for recurrence_id in ("20220824T083000", "20220820T083000"):
+        await client.cmd_result(
+            "delete",
+            {"entity_id": TEST_ENTITY, "uid": uid, "recurrence_id": recurrence_id},
+        )
+    expected = await get_events("2022-08-20T00:00:00", "2022-08-28T00:00:00")
+    assert len(expected) == 5
+    assert len(entity._calendar.events) == 3
+
+    compacted = []
+    hass.bus.async_listen(
+        "local_calendar_series_compacted", lambda event: compacted.append(event.data)
+    )
+    await hass.services.async_call(
+        DOMAIN,
+        "compact_series",
+        {},
+        target={"entity_id": TEST_ENTITY},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    assert len(entity._calendar.events) == 1
+    events = await get_events("2022-08-20T00:00:00", "2022-08-28T00:00:00")
+    assert list(map(event_fields, events)) == list(map(event_fields, expected))
+    assert len(compacted) == 1
+    assert compacted[0]["entity_id"] == TEST_ENTITY
+    assert compacted[0]["series_merged"] == 1
+    assert compacted[0]["overrides_folded"] == 1
+    assert compacted[0]["exdates_pruned"] == 1
+    assert compacted[0]["speedup"] > 0
+
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["series_compaction"]["series_merged"] == 1
+
+
+def test_compact_series_keeps_different_overrides() -> None:
+    """Test an override that differs in any field is not folded away."""
+    override = (
+        "BEGIN:VEVENT\nUID:override\nDTSTAMP:20220822T000000Z\n"
+        "DTSTART:20220823T083000\nDTEND:20220823T084500\nSUMMARY:Feed the cat\n"
+        "{extra}END:VEVENT\n"
+    )
+    content = (
+        "BEGIN:VCALENDAR\nPRODID:-//example//EN\nVERSION:2.0\n"
+        "BEGIN:VEVENT\nUID:series\nDTSTAMP:20220822T000000Z\n"
+        "DTSTART:20220822T083000\nDTEND:20220822T084500\nSUMMARY:Feed the cat\n"
+        "RRULE:FREQ=DAILY\nEXDATE:20220823T083000\nEND:VEVENT\n"
+        "{override}END:VCALENDAR\n"
+    )
+    for extra, folded in (
+        ("", 1),
+        ("STATUS:CANCELLED\n", 0),
+        ("CATEGORIES:Pets\n", 0),
+        (
+            "BEGIN:VALARM\nACTION:DISPLAY\nDESCRIPTION:Feed\n"
+            "TRIGGER:-PT15M\nEND:VALARM\n",
+            0,
+        ),
+    ):
+        calendar = IcsCalendarStream.calendar_from_ics(
+            content.format(override=override.format(extra=extra))
+        )
+        result = compact_series(
+            calendar, dt_util.DEFAULT_TIME_ZONE, datetime.datetime(2022, 8, 22)
+        )
+        assert result.overrides_folded == folded
+        assert len(calendar.events) == 2 - folded
+
+
+async def test_warm_up_day_index(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+):
+    """Test queries within the warmed days are served from the index."""
+    await hass.async_block_till_done()
+    today = dt_util.start_of_local_day()
+    start = today + datetime.timedelta(hours=9)
+    await create_event(
+        {
+            "summary": "Standup",
+            "dtstart": start.isoformat(),
+            "dtend": (start + datetime.timedelta(minutes=15)).isoformat(),
+        }
+    )
+
+    events = await get_events(
+        today.isoformat(), (today + datetime.timedelta(hours=12)).isoformat()
+    )
+    assert [event["summary"] for event in events] == ["Standup"]
+    events = await get_events(
+        today.isoformat(), (today + datetime.timedelta(hours=1)).isoformat()
+    )
+    assert not events
+    await get_events("1997-07-14T00:00:00", "1997-07-16T00:00:00")
+
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    cache = data["entities"][TEST_ENTITY]["query_cache"]
+    assert cache["day_index"]["days"] == 1
+    assert cache["day_index"]["occurrences"] == 1
+    assert cache["hits"] == 2
+    assert cache["misses"] == 1
+    assert cache["warm_up_seconds"] is not None
+
+
+async def test_day_index_updates(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+    get_events: GetEventsFn,
+):
+    """Test the day index is repaired when events change."""
+    await hass.async_block_till_done()
+    today = dt_util.start_of_local_day()
+    tomorrow = dt_util.start_of_local_day(today + datetime.timedelta(days=1))
+    client = await ws_client()
+    result = await client.cmd_result(
+        "create",
+        {
+            "entity_id": TEST_ENTITY,
+            "event": {
+                "summary": "Overnight shift",
+                "dtstart": (today + datetime.timedelta(hours=20)).isoformat(),
+                "dtend": (tomorrow + datetime.timedelta(hours=4)).isoformat(),
+            },
+        },
+    )
+
+    # The event is indexed on both days it is active, unless today is the
+    # last indexed day at the end of the week and month
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    cache = data["entities"][TEST_ENTITY]["query_cache"]
+    indexed_tomorrow = tomorrow < datetime.datetime.fromisoformat(
+        cache["day_index"]["end"]
+    )
+    assert cache["day_index"]["days"] == (2 if indexed_tomorrow else 1)
+    assert cache["day_index"]["occurrences"] == 1
+    for start in (today, tomorrow):
+        events = await get_events(
+            start.isoformat(), (start + datetime.timedelta(hours=24)).isoformat()
+        )
+        assert [event["summary"] for event in events] == ["Overnight shift"]
+
+    await client.cmd_result(
+        "update",
+        {
+            "entity_id": TEST_ENTITY,
+            "event": {
+                "uid": result["uid"],
+                "dtstart": (today + datetime.timedelta(hours=8)).isoformat(),
+                "dtend": (today + datetime.timedelta(hours=16)).isoformat(),
+            },
+        },
+    )
+    events = await get_events(
+        tomorrow.isoformat(), (tomorrow + datetime.timedelta(hours=12)).isoformat()
+    )
+    assert not events
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    cache = data["entities"][TEST_ENTITY]["query_cache"]
+    assert cache["day_index"]["days"] == 1
+    misses = cache["misses"]
+
+    # Changing the time zone invalidates the index until it is rebuilt
+    await hass.config.async_update(time_zone="Pacific/Auckland")
+    await get_events(
+        today.isoformat(), (today + datetime.timedelta(hours=1)).isoformat()
+    )
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["query_cache"]["misses"] == misses + 1
+
+
+@pytest.mark.parametrize("options", [{CONF_MAX_OCCURRENCES: 10}])
+async def test_day_index_rebuilt(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+):
+    """Test the day index is built again after it had too many occurrences."""
+    await hass.async_block_till_done()
+    # Starts before any of the indexed days
+    start = dt_util.start_of_local_day() - datetime.timedelta(days=40)
+    client = await ws_client()
+    result = await client.cmd_result(
+        "create",
+        {
+            "entity_id": TEST_ENTITY,
+            "event": {
+                "summary": "Every day",
+                "dtstart": start.isoformat(),
+                "dtend": (start + datetime.timedelta(hours=1)).isoformat(),
+                "rrule": "FREQ=DAILY",
+            },
+        },
+    )
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["query_cache"]["day_index"] is None
+
+    await client.cmd_result("delete", {"entity_id": TEST_ENTITY, "uid": result["uid"]})
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["query_cache"]["day_index"] is not None
+
+
+@pytest.mark.parametrize(
+    "options", [{CONF_MAX_OCCURRENCES: 10, CONF_MAX_EXPANSION_TIME: 0.05}]
+)
+async def test_expansion_limits(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+    caplog: pytest.LogCaptureFixture,
+):
+    """Test queries stop expanding a rule with too many occurrences."""
+    await create_event(
+        {
+            "summary": "Every day",
+            "dtstart": "1997-07-14T08:00:00",
+            "dtend": "1997-07-14T08:30:00",
+            "rrule": "FREQ=DAILY",
+        }
+    )
+    assert "produces more than 10 occurrences a year" in caplog.text
+
+    events = await get_events("1997-07-14T00:00:00", "1997-08-14T00:00:00")
+    assert len(events) == 10
+    assert "was truncated after 10 occurrences" in caplog.text
+
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    expansion = data["entities"][TEST_ENTITY]["expansion"]
+    assert expansion["max_occurrences"] == 10
+    assert expansion["truncated_queries"] >= 1
+
+
+@pytest.mark.parametrize("options", [{CONF_QUERY_CHUNK_SIZE: 2}])
+async def test_query_yields_between_chunks(
+    hass: HomeAssistant,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+):
+    """Test a large query lets other tasks run between chunks."""
+    await create_event(
+        {
+            "summary": "Every day",
+            "dtstart": "1997-07-14T08:00:00",
+            "dtend": "1997-07-14T08:30:00",
+            "rrule": "FREQ=DAILY",
+        }
+    )
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+
+    ticks = 0
+    done = False
+
+    async def other_task() -> None:
+        nonlocal ticks
+        while not done:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    task = hass.async_create_task(other_task())
+    await asyncio.sleep(0)
+    ticks = 0
+    events = await entity.async_get_events(
+        hass,
+        dt_util.as_local(datetime.datetime(1997, 8, 1, tzinfo=dt_util.UTC)),
+        dt_util.as_local(datetime.datetime(1997, 9, 1, tzinfo=dt_util.UTC)),
+    )
+    done = True
+    await task
+    assert len(events) == 31
+    assert ticks >= 10
+
+
+@pytest.mark.parametrize("options", [{CONF_QUERY_CHUNK_SIZE: 2}])
+async def test_query_reads_snapshot(
+    hass: HomeAssistant,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+):
+    """Test a query keeps reading the calendar it started with during changes."""
+    await create_event(
+        {
+            "summary": "Every day",
+            "dtstart": "1997-07-14T08:00:00",
+            "dtend": "1997-07-14T08:30:00",
+            "rrule": "FREQ=DAILY",
+        }
+    )
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+    uid = hass.states.get(TEST_ENTITY).attributes["upcoming_events"][0]["uid"]
+    start = dt_util.as_local(datetime.datetime(1997, 8, 1, tzinfo=dt_util.UTC))
+    end = dt_util.as_local(datetime.datetime(1997, 9, 1, tzinfo=dt_util.UTC))
+
+    query = hass.async_create_task(entity.async_get_events(hass, start, end))
+    await asyncio.sleep(0)
+    assert not query.done()
+    snapshot = entity._calendar
+    await entity.async_update_event(
+        uid=uid,
+        recurrence_id="19970815T080000",
+        recurrence_range="THIS_AND_FUTURE",
+        summary="Changed",
+    )
+    await entity.async_delete_event(uid, recurrence_id="19970810T080000")
+
+    # The query in progress does not see the changes
+    events = await query
+    assert len(events) == 31
+    assert {event.summary for event in events} == {"Every day"}
+    assert len(snapshot.events) == 1
+    assert snapshot.events[0].rrule.until is None
+    assert not snapshot.events[0].exdate
+
+    events = await entity.async_get_events(hass, start, end)
+    assert len(events) == 30
+    assert [event.summary for event in events].count("Changed") == 17
+
+
+async def test_store_failure(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+):
+    """Test the state matches the calendar when it can't be written."""
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    start = dt_util.now() + datetime.timedelta(hours=1)
+    with patch.object(store, "_store", side_effect=OSError("Disk full")), pytest.raises(
+        OSError
+    ):
+        await entity.async_create_event(
+            summary="Evening lights",
+            dtstart=start,
+            dtend=start + datetime.timedelta(hours=1),
+        )
+    await hass.async_block_till_done()
+    assert hass.states.get(TEST_ENTITY).attributes["message"] == "Evening lights"
+
+
+async def test_websocket_query_multiple_calendars(
+    hass: HomeAssistant,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+):
+    """Test a query merges the events from multiple calendars in order."""
+    work_entry = MockConfigEntry(domain=DOMAIN, data={CONF_CALENDAR_NAME: "Work"})
+    work_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(work_entry.entry_id)
+    await hass.async_block_till_done()
+
+    client = await ws_client()
+    for entity_id, summary, dtstart, rrule in (
+        (TEST_ENTITY, "Porch lights", "2022-08-22T19:00:00", "FREQ=DAILY"),
+        ("calendar.work", "Standup", "2022-08-22T09:00:00", "FREQ=DAILY"),
+        ("calendar.work", "Review", "2022-08-23T20:00:00", None),
+    ):
+        event = {
+            "summary": summary,
+            "dtstart": dtstart,
+            "dtend": dtstart.replace(":00:00", ":30:00"),
+        }
+        if rrule:
+            event["rrule"] = rrule
+        await client.cmd_result("create", {"entity_id": entity_id, "event": event})
+
+    result = await client.cmd_result(
+        "query",
+        {
+            "entity_ids": [TEST_ENTITY, "calendar.work"],
+            "dtstart": "2022-08-22T00:00:00",
+            "dtend": "2022-08-24T00:00:00",
+        },
+    )
+    assert [
+        (event["entity_id"], event["summary"], event["start"])
+        for event in result["events"]
+    ] == [
+        ("calendar.work", "Standup", "2022-08-22T09:00:00-06:00"),
+        (TEST_ENTITY, "Porch lights", "2022-08-22T19:00:00-06:00"),
+        ("calendar.work", "Standup", "2022-08-23T09:00:00-06:00"),
+        (TEST_ENTITY, "Porch lights", "2022-08-23T19:00:00-06:00"),
+        ("calendar.work", "Review", "2022-08-23T20:00:00-06:00"),
+    ]
+    assert result["truncated"] == []
+
+    resp = await client.cmd(
+        "query",
+        {
+            "entity_ids": [TEST_ENTITY, "calendar.unknown"],
+            "dtstart": "2022-08-22T00:00:00",
+            "dtend": "2022-08-24T00:00:00",
+        },
+    )
+    assert not resp.get("success")
+
+
+async def test_websocket_changes(
+    hass: HomeAssistant,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+):
+    """Test syncing only the events changed since a sync token."""
+    client = await ws_client()
+    result = await client.cmd_result("changes", {"entity_id": TEST_ENTITY})
+    assert result["resync"]
+    sync_token = result["sync_token"]
+
+    event = {
+        "summary": "Bastille Day Party",
+        "dtstart": "1997-07-14T17:00:00+00:00",
+        "dtend": "1997-07-15T04:00:00+00:00",
+    }
+    party = await client.cmd_result(
+        "create", {"entity_id": TEST_ENTITY, "event": event}
+    )
+    lunch = await client.cmd_result(
+        "create",
+        {"entity_id": TEST_ENTITY, "event": {**event, "summary": "Lunch"}},
+    )
+
+    result = await client.cmd_result(
+        "changes", {"entity_id": TEST_ENTITY, "sync_token": sync_token}
+    )
+    assert not result["resync"]
+    assert sorted(event["summary"] for event in result["changed"]) == [
+        "Bastille Day Party",
+        "Lunch",
+    ]
+    assert result["deleted"] == []
+    sync_token = result["sync_token"]
+
+    await client.cmd_result(
+        "update",
+        {
+            "entity_id": TEST_ENTITY,
+            "event": {"uid": party["uid"], "summary": "July Party"},
+        },
+    )
+    await client.cmd_result("delete", {"entity_id": TEST_ENTITY, "uid": lunch["uid"]})
+
+    result = await client.cmd_result(
+        "changes", {"entity_id": TEST_ENTITY, "sync_token": sync_token}
+    )
+    assert not result["resync"]
+    assert [(event["uid"], event["summary"]) for event in result["changed"]] == [
+        (party["uid"], "July Party")
+    ]
+    assert result["changed"][0]["start"] == "1997-07-14T11:00:00-06:00"
+    assert result["deleted"] == [lunch["uid"]]
+
+    # No changes since the latest token
+    result = await client.cmd_result(
+        "changes", {"entity_id": TEST_ENTITY, "sync_token": result["sync_token"]}
+    )
+    assert not result["resync"]
+    assert result["changed"] == []
+    assert result["deleted"] == []
+
+    # Tokens from another log, e.g. before a restart, require a resync
+    result = await client.cmd_result(
+        "changes", {"entity_id": TEST_ENTITY, "sync_token": "00000000-1"}
+    )
+    assert result["resync"]
+
+
+async def test_statistics(
+    hass: HomeAssistant,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+):
+    """Test occurrence counts and durations per period."""
+    client = await ws_client()
+    for summary, location, dtstart, rrule in (
+        ("Standup", "Room A", "2022-08-22T09:00:00", "FREQ=DAILY;COUNT=10"),
+        ("Review", "Room B", "2022-08-24T14:00:00", None),
+        ("Planning", "Room A", "2022-08-29T10:00:00", None),
+    ):
+        event = {
+            "summary": summary,
+            "dtstart": dtstart,
+            "dtend": dtstart.replace(":00:00", ":30:00"),
+        }
+        if rrule:
+            event["rrule"] = rrule
+        result = await client.cmd_result(
+            "create", {"entity_id": TEST_ENTITY, "event": event}
+        )
+        await client.cmd_result(
+            "update",
+            {
+                "entity_id": TEST_ENTITY,
+                "event": {"uid": result["uid"], "location": location},
+            },
+        )
+
+    result = await client.cmd_result(
+        "statistics",
+        {
+            "entity_id": TEST_ENTITY,
+            "dtstart": "2022-08-22T00:00:00",
+            "dtend": "2022-09-05T00:00:00",
+            "period": "week",
+            "group_by": "location",
+        },
+    )
+    assert result == {
+        "period": "week",
+        "group_by": "location",
+        "occurrences": 12,
+        "truncated": False,
+        "buckets": [
+            {"start": "2022-08-22", "group": "Room A", "count": 7, "duration": 12600},
+            {"start": "2022-08-22", "group": "Room B", "count": 1, "duration": 1800},
+            {"start": "2022-08-29", "group": "Room A", "count": 4, "duration": 7200},
+        ],
+    }
+
+    statistics = []
+    hass.bus.async_listen(
+        "local_calendar_statistics", lambda event: statistics.append(event.data)
+    )
+    await hass.services.async_call(
+        DOMAIN,
+        "statistics",
+        {"dtstart": "2022-08-22T00:00:00", "dtend": "2022-08-23T00:00:00"},
+        target={"entity_id": TEST_ENTITY},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+    assert statistics == [
+        {
+            "entity_id": TEST_ENTITY,
+            "period": "day",
+            "group_by": None,
+            "occurrences": 1,
+            "truncated": False,
+            "buckets": [{"start": "2022-08-22", "count": 1, "duration": 1800}],
+        }
+    ]
+
+
+@pytest.mark.parametrize("options", [{CONF_PARALLEL_EXPANSION_THRESHOLD: 100}])
+async def test_parallel_expansion(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+):
+    """Test wide queries are expanded in worker processes and merged in order."""
+    for summary, dtstart in (
+        ("Feed the cat", "1997-07-14T08:00:00"),
+        ("Walk the dog", "1997-07-14T07:00:00"),
+        ("Water plants", "1997-07-15T07:30:00"),
+    ):
+        await create_event(
+            {
+                "summary": summary,
+                "dtstart": dtstart,
+                "dtend": dtstart.replace(":00:00", ":15:00").replace(":30:", ":45:"),
+                "rrule": "FREQ=DAILY",
+            }
+        )
+
+    # A narrow query is expanded in the event loop
+    events = await get_events("1997-07-15T00:00:00", "1997-07-16T00:00:00")
+    assert [event["summary"] for event in events] == [
+        "Walk the dog",
+        "Water plants",
+        "Feed the cat",
+    ]
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["expansion"]["parallel"]["queries"] == 0
+
+    events = await get_events("1997-07-14T00:00:00", "1997-10-14T00:00:00")
+    assert len(events) == 92 * 3 - 1
+    assert [event["summary"] for event in events[:4]] == [
+        "Walk the dog",
+        "Feed the cat",
+        "Walk the dog",
+        "Water plants",
+    ]
+    starts = [event["start"]["dateTime"] for event in events]
+    assert starts == sorted(starts)
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["entities"][TEST_ENTITY]["expansion"]["parallel"]["queries"] == 1
+
+    # Worker processes are stopped when the calendar is unloaded
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+@pytest.fixture(name="gate_load")
+def mock_gate_load() -> asyncio.Event:
+    """Fixture to hold back loading the calendar until the event is set."""
+    gate = asyncio.Event()
+    load = LocalCalendarEntity._async_load
+
+    async def gated_load(self, ics: str) -> None:
+        await gate.wait()
+        await load(self, ics)
+
+    with patch.object(LocalCalendarEntity, "_async_load", gated_load):
+        yield gate
+
+
+async def wait_for_state(hass: HomeAssistant) -> State:
+    """Return the state of the entity once added, without waiting for tasks."""
+    for _ in range(500):
+        if (state := hass.states.get(TEST_ENTITY)) is not None:
+            return state
+        await asyncio.sleep(0.01)
+    raise AssertionError("Entity was not added")
+
+
+async def test_restore_while_loading(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    gate_load: asyncio.Event,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+):
+    """Test the last events are restored at once and the calendar loads later."""
+    now = dt_util.now()
+    mock_restore_cache_with_extra_data(
+        hass,
+        [
+            (
+                State(TEST_ENTITY, STATE_ON),
+                {
+                    "events": [
+                        {
+                            "summary": "Ended lights",
+                            "start": (now - datetime.timedelta(hours=2)).isoformat(),
+                            "end": (now - datetime.timedelta(hours=1)).isoformat(),
+                            "timespan": [
+                                (now - datetime.timedelta(hours=2)).isoformat(),
+                                (now - datetime.timedelta(hours=1)).isoformat(),
+                            ],
+                        },
+                        {
+                            "summary": "Evening lights",
+                            "uid": "restored-uid",
+                            "start": (now - datetime.timedelta(minutes=30)).isoformat(),
+                            "end": (now + datetime.timedelta(minutes=30)).isoformat(),
+                            "timespan": [
+                                (now - datetime.timedelta(minutes=30)).isoformat(),
+                                (now + datetime.timedelta(minutes=30)).isoformat(),
+                            ],
+                        },
+                    ]
+                },
+            )
+        ],
+    )
+    config_entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+
+    # The state is restored before the calendar is loaded
+    state = await wait_for_state(hass)
+    assert state.state == STATE_ON
+    assert state.attributes["message"] == "Evening lights"
+    assert [event["summary"] for event in state.attributes["upcoming_events"]] == [
+        "Evening lights"
+    ]
+
+    # Changes wait for the calendar to load
+    start = now + datetime.timedelta(days=1)
+    create = asyncio.create_task(
+        create_event(
+            {
+                "summary": "Morning lights",
+                "dtstart": start,
+                "dtend": start + datetime.timedelta(hours=1),
+            }
+        )
+    )
+    await asyncio.sleep(0)
+    assert not create.done()
+
+    gate_load.set()
+    await create
+    await hass.async_block_till_done()
+
+    # The stored calendar replaces the restored events
+    state = hass.states.get(TEST_ENTITY)
+    assert state.state == STATE_OFF
+    assert state.attributes["message"] == "Morning lights"
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+    restored = entity.extra_restore_state_data.as_dict()["events"]
+    assert [(event["summary"], event["start"]) for event in restored] == [
+        ("Morning lights", start.isoformat())
+    ]
+
+
+async def test_load_failure(
+    hass: HomeAssistant, config_entry: MockConfigEntry, ws_client: ClientFixture
+):
+    """Test a calendar that can't be parsed is unavailable."""
+    content = (
+        "BEGIN:VCALENDAR\nBEGIN:VEVENT\nDTSTART:invalid\nEND:VEVENT\nEND:VCALENDAR\n"
+    )
+
+    def new_store(hass: HomeAssistant, path: Path, **kwargs: Any) -> FakeStore:
+        store = FakeStore(hass, path, **kwargs)
+        store._content = content
+        return store
+
+    config_entry.add_to_hass(hass)
+    with patch("custom_components.local_calendar.LocalCalendarStore", new=new_store):
+        assert await async_setup_component(hass, DOMAIN, {})
+        await hass.async_block_till_done()
+
+    assert hass.states.get(TEST_ENTITY).state == STATE_UNAVAILABLE
+    entity = hass.data["calendar"].get_entity(TEST_ENTITY)
+    with pytest.raises(HomeAssistantError, match="Unable to load"):
+        await entity.async_create_event(
+            summary="Morning lights",
+            dtstart=dt_util.now(),
+            dtend=dt_util.now() + datetime.timedelta(hours=1),
+        )
+
+    client = await ws_client()
+    resp = await client.cmd(
+        "query",
+        {
+            "entity_ids": [TEST_ENTITY],
+            "dtstart": "2022-08-22T00:00:00",
+            "dtend": "2022-08-24T00:00:00",
+        },
+    )
+    assert not resp.get("success")
+    assert resp["error"]["code"] == "failed"
+    assert resp["error"]["message"].startswith(f"Unable to load {TEST_ENTITY}")
+
+    # The calendar is loaded once the file is fixed
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    store._content = content.replace(
+        "DTSTART:invalid",
+        "UID:fixed\nDTSTAMP:20220822T000000Z\nDTSTART:20220822T100000\n"
+        "DTEND:20220822T110000",
+    )
+    async_fire_time_changed(hass, dt_util.utcnow() + POLL_INTERVAL)
+    await hass.async_block_till_done()
+    assert hass.states.get(TEST_ENTITY).state != STATE_UNAVAILABLE
+    result = await client.cmd_result(
+        "query",
+        {
+            "entity_ids": [TEST_ENTITY],
+            "dtstart": "2022-08-22T00:00:00",
+            "dtend": "2022-08-24T00:00:00",
+        },
+    )
+    assert len(result["events"]) == 1
@@ -0,0 +1,30 @@
+"""Tests for the change log of local calendar."""
+
+from custom_components.local_calendar.changes import ChangeLog
+
+
+def test_changes_since() -> None:
+    """Test the uids changed since a sync token."""
+    log = ChangeLog()
+    token = log.sync_token
+    log.record({"a", "b"})
+    assert log.changes_since(token) == {"a", "b"}
+    token = log.sync_token
+    log.record({"b"})
+    assert log.changes_since(token) == {"b"}
+    assert log.changes_since(log.sync_token) == set()
+    assert log.changes_since("invalid") is None
+    assert log.changes_since(f"{token[:-2]}-99") is None
+
+
+def test_changes_dropped_from_log() -> None:
+    """Test a resync is required when changes fall out of the log."""
+    log = ChangeLog(size=3)
+    token = log.sync_token
+    log.record({"a"})
+    recent = log.sync_token
+    log.record({"b", "c"})
+    assert log.changes_since(token) == {"a", "b", "c"}
+    log.record({"d"})
+    assert log.changes_since(token) is None
+    assert log.changes_since(recent) == {"b", "c", "d"}
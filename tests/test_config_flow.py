@@ -4,8 +4,25 @@ from unittest.mock import patch
 from homeassistant import config_entries
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResultType
+from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.local_calendar.const import CONF_CALENDAR_NAME, DOMAIN
+from custom_components.local_calendar.const import (
+    CONF_CALENDAR_NAME,
+    CONF_MAX_EXPANSION_TIME,
+    CONF_MAX_OCCURRENCES,
+    CONF_PARALLEL_EXPANSION_THRESHOLD,
+    CONF_QUERY_CHUNK_SIZE,
+    CONF_QUERY_CHUNK_TIME,
+    CONF_STORAGE_COMPRESSION,
+    CONF_STORAGE_ENGINE,
+    DEFAULT_MAX_EXPANSION_TIME,
+    DEFAULT_MAX_OCCURRENCES,
+    DEFAULT_PARALLEL_EXPANSION_THRESHOLD,
+    DEFAULT_QUERY_CHUNK_SIZE,
+    DEFAULT_QUERY_CHUNK_TIME,
+    DOMAIN,
+    ENGINE_ICS,
+)
 
 
 async def test_form(hass: HomeAssistant) -> None:
@@ -34,3 +51,34 @@ async def test_form(hass: HomeAssistant) -> None:
         CONF_CALENDAR_NAME: "My Calendar",
     }
     assert len(mock_setup_entry.mock_calls) == 1
+
+
+async def test_options_flow(hass: HomeAssistant) -> None:
+    """Test changing the storage options."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, data={CONF_CALENDAR_NAME: "My Calendar"}
+    )
+    config_entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "init"
+
+    with patch(
+        "custom_components.local_calendar.async_setup_entry",
+        return_value=True,
+    ):
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"], {CONF_STORAGE_COMPRESSION: "gzip"}
+        )
+        await hass.async_block_till_done()
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert config_entry.options == {
+        CONF_STORAGE_ENGINE: ENGINE_ICS,
+        CONF_STORAGE_COMPRESSION: "gzip",
+        CONF_MAX_OCCURRENCES: DEFAULT_MAX_OCCURRENCES,
+        CONF_MAX_EXPANSION_TIME: DEFAULT_MAX_EXPANSION_TIME,
+        CONF_QUERY_CHUNK_SIZE: DEFAULT_QUERY_CHUNK_SIZE,
+        CONF_QUERY_CHUNK_TIME: DEFAULT_QUERY_CHUNK_TIME,
+        CONF_PARALLEL_EXPANSION_THRESHOLD: DEFAULT_PARALLEL_EXPANSION_THRESHOLD,
+    }
@@ -0,0 +1,189 @@
+"""Tests for the local calendar SQLite storage engine."""
+
+import os
+import sqlite3
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from ical.calendar_stream import IcsCalendarStream
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.local_calendar.const import CONF_STORAGE_ENGINE, DOMAIN
+from custom_components.local_calendar.serialization import calendar_header, event_to_ics
+from custom_components.local_calendar.store import LocalCalendarStore, join_calendar
+
+from .conftest import TEST_ENTITY, GetEventsFn
+
+ICS_CONTENT = """BEGIN:VCALENDAR
+PRODID:-//example//1.0//EN
+VERSION:2.0
+BEGIN:VEVENT
+DTSTAMP:20220822T080000
+UID:event-1
+DTSTART:20220822T083000
+DTEND:20220822T084500
+SUMMARY:Feed the cat
+RRULE:FREQ=DAILY
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+@pytest.fixture(autouse=True)
+def setup_config_dir(hass: HomeAssistant, tmp_path: Path) -> Path:
+    """Use a temporary config directory with an existing calendar file."""
+    hass.config.config_dir = str(tmp_path)
+    (tmp_path / ".storage").mkdir()
+    (tmp_path / ".storage/local_calendar.light_schedule.ics").write_text(ICS_CONTENT)
+    return tmp_path
+
+
+@pytest.fixture(name="options")
+def mock_options() -> dict[str, Any]:
+    """Use the SQLite storage engine."""
+    return {CONF_STORAGE_ENGINE: "sqlite"}
+
+
+def database_rows(config_dir: Path) -> list[tuple[str, str]]:
+    """Return the uid and summary line of each event in the database."""
+    with sqlite3.connect(
+        config_dir / ".storage/local_calendar.light_schedule.db"
+    ) as conn:
+        rows = conn.execute("SELECT uid, ics FROM events ORDER BY rowid").fetchall()
+    return [
+        (uid, next(line for line in ics.split("\n") if line.startswith("SUMMARY")))
+        for uid, ics in rows
+    ]
+
+
+async def test_import_and_per_event_writes(
+    hass: HomeAssistant,
+    setup_config_dir: Path,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+) -> None:
+    """Test the existing calendar is imported and changes write single events."""
+    assert database_rows(setup_config_dir) == [("event-1", "SUMMARY:Feed the cat")]
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    assert store.stats["events_written"] == 1
+
+    await create_event(
+        {
+            "summary": "Bastille Day Party",
+            "dtstart": "2022-07-14T17:00:00",
+            "dtend": "2022-07-14T23:00:00",
+        }
+    )
+    assert store.stats["events_written"] == 2
+    rows = database_rows(setup_config_dir)
+    assert [summary for _, summary in rows] == [
+        "SUMMARY:Feed the cat",
+        "SUMMARY:Bastille Day Party",
+    ]
+
+    # The calendar file is no longer used once imported
+    (setup_config_dir / ".storage/local_calendar.light_schedule.ics").unlink()
+    assert await hass.config_entries.async_reload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    events = await get_events("2022-07-14T00:00:00", "2022-08-24T00:00:00")
+    assert [event["summary"] for event in events] == [
+        "Bastille Day Party",
+        "Feed the cat",
+        "Feed the cat",
+    ]
+
+
+async def test_export_and_import(
+    hass: HomeAssistant,
+    setup_config_dir: Path,
+    _setup_integration: None,
+    get_events: GetEventsFn,
+) -> None:
+    """Test exporting the calendar and importing an ics file."""
+    await hass.services.async_call(
+        DOMAIN, "export_ics", {}, target={"entity_id": TEST_ENTITY}, blocking=True
+    )
+    paths = list(setup_config_dir.glob("local_calendar.calendar_light_schedule.*.ics"))
+    assert len(paths) == 1
+    assert "SUMMARY:Feed the cat" in paths[0].read_text()
+
+    (setup_config_dir / "vacation.ics").write_text(
+        ICS_CONTENT.replace("event-1", "event-2").replace("Feed the cat", "Vacation")
+    )
+    await hass.services.async_call(
+        DOMAIN,
+        "import_ics",
+        {"filename": "vacation.ics"},
+        target={"entity_id": TEST_ENTITY},
+        blocking=True,
+    )
+    assert database_rows(setup_config_dir) == [("event-2", "SUMMARY:Vacation")]
+    events = await get_events("2022-08-22T00:00:00", "2022-08-23T00:00:00")
+    assert [event["summary"] for event in events] == ["Vacation"]
+
+
+async def test_switch_storage_engine(
+    hass: HomeAssistant,
+    setup_config_dir: Path,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    create_event: Callable[[dict[str, Any]], Awaitable[None]],
+    get_events: GetEventsFn,
+) -> None:
+    """Test changes are kept when switching between storage engines."""
+    ics_path = setup_config_dir / ".storage/local_calendar.light_schedule.ics"
+    database_path = setup_config_dir / ".storage/local_calendar.light_schedule.db"
+    await create_event(
+        {
+            "summary": "Bastille Day Party",
+            "dtstart": "2022-07-14T17:00:00",
+            "dtend": "2022-07-14T23:00:00",
+        }
+    )
+    # The database was written after the calendar file
+    mtime = ics_path.stat().st_mtime
+    os.utime(database_path, (mtime + 10, mtime + 10))
+
+    with patch(
+        "custom_components.local_calendar.LocalCalendarStore", new=LocalCalendarStore
+    ):
+        hass.config_entries.async_update_entry(
+            config_entry, options={CONF_STORAGE_ENGINE: "ics"}
+        )
+        await hass.async_block_till_done()
+        assert "SUMMARY:Bastille Day Party" in ics_path.read_text()
+        events = await get_events("2022-07-14T00:00:00", "2022-07-15T00:00:00")
+        assert [event["summary"] for event in events] == ["Bastille Day Party"]
+
+        # The calendar file is changed while the ics storage engine is used
+        ics_path.write_text(
+            ics_path.read_text().replace("Bastille Day Party", "Fireworks")
+        )
+        os.utime(ics_path, (mtime + 20, mtime + 20))
+        hass.config_entries.async_update_entry(
+            config_entry, options={CONF_STORAGE_ENGINE: "sqlite"}
+        )
+        await hass.async_block_till_done()
+
+    events = await get_events("2022-07-14T00:00:00", "2022-07-15T00:00:00")
+    assert [event["summary"] for event in events] == ["Fireworks"]
+    assert "SUMMARY:Fireworks" in [
+        summary for _, summary in database_rows(setup_config_dir)
+    ]
+
+
+def test_render_events_individually() -> None:
+    """Test joining rendered events matches rendering the whole calendar."""
+    calendar = IcsCalendarStream.calendar_from_ics(
+        ICS_CONTENT.replace("SUMMARY:Feed the cat", f"SUMMARY:{'Feed the cat ' * 10}")
+    )
+    content = join_calendar(
+        calendar_header(calendar), [event_to_ics(event) for event in calendar.events]
+    )
+    assert content == IcsCalendarStream.calendar_to_ics(calendar)
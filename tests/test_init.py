@@ -0,0 +1,42 @@
+"""Tests for the setup of local calendar."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.local_calendar.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+
+# Home Assistant core modules are loaded before any integration. The
+# diagnostics platform is imported as soon as the integration is loaded.
+IMPORT_SCRIPT = """
+import sys
+import homeassistant.config_entries
+import custom_components.local_calendar
+import custom_components.local_calendar.diagnostics
+print(",".join(name for name in sys.modules if name.split(".")[0] == "ical"))
+"""
+
+
+def test_import_defers_ical() -> None:
+    """Test importing the integration and diagnostics does not import ical."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert result.stdout.strip() == ""
+
+
+async def test_import_seconds(
+    hass: HomeAssistant, config_entry: MockConfigEntry, _setup_integration: None
+) -> None:
+    """Test the time to import the calendar platform is reported."""
+    data = await async_get_config_entry_diagnostics(hass, config_entry)
+    assert data["import_seconds"] >= 0
@@ -0,0 +1,145 @@
+"""Load test harness for the local calendar websocket commands.
+
+Many concurrent websocket clients create, update, fetch and delete events on
+the same calendar while the latency of each command is recorded. A report
+with throughput, p50/p99 latency and storage lock wait times is printed at the
+end. The defaults keep the test fast; to size a calendar for a household run
+with more clients, for example:
+
+    LOAD_TEST_CLIENTS=50 LOAD_TEST_ROUNDS=20 pytest tests/test_load.py -s
+"""
+
+import asyncio
+import datetime
+import math
+import os
+import time
+from collections.abc import Awaitable, Callable
+
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.local_calendar.const import DOMAIN
+
+from .conftest import TEST_ENTITY, Client, ClientFixture, GetEventsFn
+
+NUM_CLIENTS = int(os.environ.get("LOAD_TEST_CLIENTS", "8"))
+NUM_ROUNDS = int(os.environ.get("LOAD_TEST_ROUNDS", "3"))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the nearest-rank percentile of the samples."""
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class LatencyRecorder:
+    """Records the latency of each operation by name."""
+
+    def __init__(self) -> None:
+        """Initialize LatencyRecorder."""
+        self.samples: dict[str, list[float]] = {}
+
+    async def timed(self, name: str, call: Callable[[], Awaitable[dict]]) -> dict:
+        """Invoke the call and record its latency."""
+        start = time.perf_counter()
+        result = await call()
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def report(self, elapsed: float, storage: dict) -> str:
+        """Return a human readable report of the recorded samples."""
+        total = sum(len(samples) for samples in self.samples.values())
+        lines = [
+            f"{NUM_CLIENTS} clients x {NUM_ROUNDS} rounds: {total} operations "
+            f"in {elapsed:.3f}s ({total / elapsed:.1f} ops/s)",
+            f"{'operation':<10} {'count':>6} {'p50 ms':>9} {'p99 ms':>9}",
+        ]
+        for name, samples in self.samples.items():
+            lines.append(
+                f"{name:<10} {len(samples):>6} "
+                f"{percentile(samples, 50) * 1000:>9.2f} "
+                f"{percentile(samples, 99) * 1000:>9.2f}"
+            )
+        lines.append(
+            f"store lock: {storage['lock_acquisitions']} acquisitions, "
+            f"{storage['lock_wait_seconds'] * 1000:.2f}ms total wait, "
+            f"{storage['lock_wait_max_seconds'] * 1000:.2f}ms max wait"
+        )
+        return "\n".join(lines)
+
+
+async def run_client(
+    client: Client,
+    client_id: int,
+    recorder: LatencyRecorder,
+    get_events: GetEventsFn,
+) -> None:
+    """Run rounds of mutations and range fetches from a single client."""
+    for round_id in range(NUM_ROUNDS):
+        day = datetime.date(2022, 10, 1) + datetime.timedelta(days=round_id)
+        result = await recorder.timed(
+            "create",
+            lambda: client.cmd_result(
+                "create",
+                {
+                    "entity_id": TEST_ENTITY,
+                    "event": {
+                        "summary": f"Client {client_id} round {round_id}",
+                        "dtstart": f"{day.isoformat()}T08:00:00",
+                        "dtend": f"{day.isoformat()}T09:00:00",
+                    },
+                },
+            ),
+        )
+        uid = result["uid"]
+        await recorder.timed(
+            "update",
+            lambda: client.cmd_result(
+                "update",
+                {
+                    "entity_id": TEST_ENTITY,
+                    "event": {"uid": uid, "summary": f"Client {client_id} updated"},
+                },
+            ),
+        )
+        await recorder.timed(
+            "fetch",
+            lambda: get_events(
+                f"{day.isoformat()}T00:00:00", f"{day.isoformat()}T23:59:59"
+            ),
+        )
+        await recorder.timed(
+            "delete",
+            lambda: client.cmd_result("delete", {"entity_id": TEST_ENTITY, "uid": uid}),
+        )
+
+
+async def test_concurrent_websocket_clients(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration: None,
+    ws_client: ClientFixture,
+    get_events: GetEventsFn,
+) -> None:
+    """Drive concurrent clients against the calendar and report latency."""
+    clients = [await ws_client() for _ in range(NUM_CLIENTS)]
+    recorder = LatencyRecorder()
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_client(client, client_id, recorder, get_events)
+            for client_id, client in enumerate(clients)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    store = hass.data[DOMAIN][config_entry.entry_id]
+    print(recorder.report(elapsed, store.stats))
+
+    for name in ("create", "update", "fetch", "delete"):
+        assert len(recorder.samples[name]) == NUM_CLIENTS * NUM_ROUNDS
+    # Every event was deleted by its client
+    assert not await get_events("2022-10-01T00:00:00", "2022-11-01T00:00:00")
@@ -0,0 +1,136 @@
+"""Tests for the local calendar storage."""
+
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from watchdog.observers import Observer
+
+from custom_components.local_calendar.store import LocalCalendarStore
+
+ICS_CONTENT = "BEGIN:VCALENDAR\nVERSION:2.0\nEND:VCALENDAR\n" * 20
+
+
+@pytest.mark.parametrize(
+    "compression,magic",
+    [
+        ("none", b"BEGIN:VCALENDAR"),
+        ("gzip", b"\x1f\x8b"),
+        ("bz2", b"BZh"),
+        ("lzma", b"\xfd7zXZ\x00"),
+    ],
+)
+async def test_compressed_storage(
+    hass: HomeAssistant, tmp_path: Path, compression: str, magic: bytes
+) -> None:
+    """Test storing and loading the calendar in each format."""
+    path = tmp_path / "calendar.ics"
+    store = LocalCalendarStore(hass, path, compression=compression)
+    await store.async_store(ICS_CONTENT)
+    assert path.read_bytes().startswith(magic)
+
+    assert await store.async_load() == ICS_CONTENT
+    stats = store.stats
+    assert stats["stores"] == 1
+    assert stats["loads"] == 1
+    assert stats["skipped_stores"] == 0
+    assert stats["migrations"] == 0
+    assert stats["content_bytes"] == len(ICS_CONTENT)
+    if compression != "none":
+        assert stats["bytes_saved"] > 0
+
+
+@pytest.mark.parametrize("compression", ["gzip", "bz2", "lzma"])
+async def test_truncated_storage(
+    hass: HomeAssistant, tmp_path: Path, compression: str
+) -> None:
+    """Test a partly written compressed file raises an OSError."""
+    path = tmp_path / "calendar.ics"
+    store = LocalCalendarStore(hass, path, compression=compression)
+    await store.async_store(ICS_CONTENT)
+    path.write_bytes(path.read_bytes()[:-10])
+
+    with pytest.raises(OSError):
+        await store.async_load()
+
+
+async def test_migrate_storage(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test an existing file is converted to the configured format."""
+    path = tmp_path / "calendar.ics"
+    path.write_text(ICS_CONTENT)
+
+    store = LocalCalendarStore(hass, path, compression="gzip")
+    assert await store.async_load() == ICS_CONTENT
+    assert path.read_bytes().startswith(b"\x1f\x8b")
+    assert store.stats["migrations"] == 1
+
+    # Loading again with compression disabled converts it back
+    store = LocalCalendarStore(hass, path)
+    assert await store.async_load() == ICS_CONTENT
+    assert path.read_text() == ICS_CONTENT
+
+
+async def test_skip_unchanged_store(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test content that is already on disk is not written again."""
+    path = tmp_path / "calendar.ics"
+    store = LocalCalendarStore(hass, path)
+    await store.async_store(ICS_CONTENT)
+    await store.async_store(ICS_CONTENT)
+    assert store.stats["stores"] == 1
+    assert store.stats["skipped_stores"] == 1
+
+    # A file changed by another program is written even with the same content
+    path.write_text("BEGIN:VCALENDAR\nEND:VCALENDAR\n")
+    await store.async_store(ICS_CONTENT)
+    assert path.read_text() == ICS_CONTENT
+    assert store.stats["stores"] == 2
+
+    # Content that was loaded is not written back
+    store = LocalCalendarStore(hass, path)
+    assert await store.async_load() == ICS_CONTENT
+    await store.async_store(ICS_CONTENT)
+    assert store.stats["stores"] == 0
+    assert store.stats["skipped_stores"] == 1
+
+
+async def test_atomic_store(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test a failed write leaves the existing file and no temporary file."""
+    path = tmp_path / "calendar.ics"
+    store = LocalCalendarStore(hass, path)
+    await store.async_store(ICS_CONTENT)
+    assert oct(path.stat().st_mode & 0o777) == oct(0o644)
+
+    with patch(
+        "custom_components.local_calendar.store.os.fsync", side_effect=OSError
+    ), pytest.raises(OSError):
+        await store.async_store("BEGIN:VCALENDAR\nEND:VCALENDAR\n")
+    assert path.read_text() == ICS_CONTENT
+    assert list(tmp_path.iterdir()) == [path]
+
+
+async def test_watch_file(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test a change made by another program is reported by the observer."""
+    path = tmp_path / "calendar.ics"
+    store = LocalCalendarStore(hass, path)
+    await store.async_store(ICS_CONTENT)
+
+    changed = asyncio.Event()
+
+    async def on_change() -> None:
+        changed.set()
+
+    with patch("custom_components.local_calendar.store.Observer", new=Observer):
+        unsub = store.async_watch(on_change)
+    try:
+        # Other files in the directory are ignored
+        (tmp_path / "other.ics").write_text(ICS_CONTENT)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(changed.wait(), 0.5)
+
+        path.write_text("BEGIN:VCALENDAR\nEND:VCALENDAR\n")
+        await asyncio.wait_for(changed.wait(), 5)
+    finally:
+        unsub()
+        await hass.async_block_till_done()
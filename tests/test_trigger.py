@@ -0,0 +1,135 @@
+"""Tests for the local calendar trigger platform."""
+
+import datetime
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import homeassistant.util.dt as dt_util
+import pytest
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.local_calendar.trigger import (
+    TRIGGER_SCHEMA,
+    async_attach_trigger,
+)
+
+from .conftest import TEST_ENTITY
+
+AttachFn = Callable[..., Awaitable[list[dict[str, Any]]]]
+
+
+@pytest.fixture(name="attach_trigger")
+def attach_trigger_fixture(hass: HomeAssistant) -> AttachFn:
+    """Fixture to attach a trigger that records each time it fires."""
+
+    async def _attach(**kwargs: Any) -> list[dict[str, Any]]:
+        calls: list[dict[str, Any]] = []
+
+        async def action(run_variables: dict[str, Any], context=None) -> None:
+            calls.append(run_variables["trigger"])
+
+        config = TRIGGER_SCHEMA(
+            {"platform": "local_calendar", "entity_id": TEST_ENTITY, **kwargs}
+        )
+        await async_attach_trigger(hass, config, action, {"trigger_data": {}})
+        return calls
+
+    return _attach
+
+
+async def test_start_trigger_with_offset(
+    hass: HomeAssistant, _setup_integration, create_event, attach_trigger
+):
+    """Test a trigger that fires before the start of an event."""
+    now = dt_util.utcnow()
+    await create_event(
+        {
+            "summary": "Evening lights",
+            "dtstart": now + datetime.timedelta(minutes=30),
+            "dtend": now + datetime.timedelta(minutes=60),
+        }
+    )
+    calls = await attach_trigger(offset="-00:15:00")
+
+    async_fire_time_changed(hass, now + datetime.timedelta(minutes=14))
+    await hass.async_block_till_done()
+    assert not calls
+
+    async_fire_time_changed(hass, now + datetime.timedelta(minutes=16))
+    await hass.async_block_till_done()
+    assert [call["calendar_event"]["summary"] for call in calls] == ["Evening lights"]
+    assert calls[0]["event"] == "start"
+
+
+async def test_trigger_repaired_on_change(
+    hass: HomeAssistant,
+    _setup_integration,
+    create_event,
+    delete_event,
+    attach_trigger,
+):
+    """Test that pending fire times follow events created and deleted."""
+    now = dt_util.utcnow()
+    start_calls = await attach_trigger()
+    end_calls = await attach_trigger(event="end")
+
+    await create_event(
+        {
+            "summary": "Cancelled",
+            "dtstart": now + datetime.timedelta(minutes=10),
+            "dtend": now + datetime.timedelta(minutes=20),
+        }
+    )
+    state = hass.states.get(TEST_ENTITY)
+    await delete_event({"uid": state.attributes["upcoming_events"][0]["uid"]})
+    await create_event(
+        {
+            "summary": "Walk",
+            "dtstart": now + datetime.timedelta(minutes=15),
+            "dtend": now + datetime.timedelta(minutes=25),
+        }
+    )
+
+    async_fire_time_changed(hass, now + datetime.timedelta(minutes=20))
+    await hass.async_block_till_done()
+    assert [call["calendar_event"]["summary"] for call in start_calls] == ["Walk"]
+    assert not end_calls
+
+    async_fire_time_changed(hass, now + datetime.timedelta(minutes=30))
+    await hass.async_block_till_done()
+    assert [call["calendar_event"]["summary"] for call in end_calls] == ["Walk"]
+
+
+async def test_trigger_after_reload(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    _setup_integration,
+    create_event,
+    attach_trigger,
+):
+    """Test triggers follow the new entity when the config entry is reloaded."""
+    now = dt_util.utcnow()
+    calls = await attach_trigger()
+
+    assert await hass.config_entries.async_reload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    end_calls = await attach_trigger(event="end")
+
+    await create_event(
+        {
+            "summary": "Walk",
+            "dtstart": now + datetime.timedelta(minutes=10),
+            "dtend": now + datetime.timedelta(minutes=20),
+        }
+    )
+    async_fire_time_changed(hass, now + datetime.timedelta(minutes=15))
+    await hass.async_block_till_done()
+    assert [call["calendar_event"]["summary"] for call in calls] == ["Walk"]
+
+    async_fire_time_changed(hass, now + datetime.timedelta(minutes=25))
+    await hass.async_block_till_done()
+    assert [call["calendar_event"]["summary"] for call in end_calls] == ["Walk"]